@@ -1,14 +1,16 @@
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
-from db.init import test_connection
+import threading
+import multiprocessing
+from db.init import test_connection, database_ready, indexes_ready
 from db.lgin import login_user
 from db.register import register_user
-from db.verification import verify_user_image, get_verification_status
+from db.verification import verify_user_image, get_verification_status, get_verification_image, verification_pool, verification_heartbeat
 from db.heatmap import get_heatmap_data
 from db.safety_poll import submit_safety_poll, get_safety_polls
 from db.emergency import send_sos, send_location_to_contacts
-from db.contacts import get_trusted_contacts, add_trusted_contact, update_trusted_contact, delete_trusted_contact
+from db.contacts import get_trusted_contacts, add_trusted_contact, update_trusted_contact, delete_trusted_contact, sync_trusted_contacts
 
 # Create Flask app
 app = Flask(__name__)
@@ -21,12 +23,17 @@ CORS(app, origins=["*"], methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
 def static_files(filename):
     return send_from_directory('static', filename)
 
-# Test database connection on startup
-print("Testing database connection...")
-if test_connection():
-    print("Database connection successful!")
-else:
-    print("Database connection failed!")
+# OCR worker processes re-import this module when run as `python app.py`;
+# only the server process starts the background work
+if multiprocessing.parent_process() is None:
+    # Connect to the database in the background so the server starts serving
+    # at once; /api/health reports "warming" until the connection is up
+    print("Connecting to database in the background...")
+    database_ready.warm_up()
+
+    # Keep this process's OCR jobs leased and re-queue the jobs of server
+    # processes that stopped
+    threading.Thread(target=verification_heartbeat, name="verification-heartbeat", daemon=True).start()
 
 
 
@@ -54,12 +61,34 @@ def verify_image():
 def verification_status(user_id):
     return get_verification_status(user_id)
 
+@app.route('/api/verification-image/<verification_id>', methods=['GET'])
+def verification_image(verification_id):
+    return get_verification_image(verification_id)
+
 # Health check endpoint
 @app.route('/api/health')
 def health_check():
+    if database_ready.state == "ready":
+        database = "connected" if test_connection() else "disconnected"
+    elif database_ready.state == "warming":
+        database = "warming"
+    else:
+        # Retry a failed connection in the background
+        database_ready.warm_up()
+        database = "disconnected"
+    if database == "warming":
+        status = "warming"
+    elif indexes_ready.state == "failed":
+        # Connected, but duplicate sign-ups are only caught by a racy check
+        status = "degraded"
+    else:
+        status = "healthy"
     return jsonify({
-        "status": "healthy",
-        "database": "connected" if test_connection() else "disconnected"
+        "status": status,
+        "database": database,
+        "database_warm_up": database_ready.status(),
+        "database_indexes": indexes_ready.status(),
+        "verification_queue": verification_pool.stats()
     })
 
 # Add a simple test endpoint
@@ -100,13 +129,17 @@ def contacts_get(user_id):
 def contacts_add(user_id):
     return add_trusted_contact(user_id)
 
-@app.route('/api/contacts/<user_id>/<int:contact_index>', methods=['PUT'])
-def contacts_update(user_id, contact_index):
-    return update_trusted_contact(user_id, contact_index)
+@app.route('/api/contacts/<user_id>/sync', methods=['POST'])
+def contacts_sync(user_id):
+    return sync_trusted_contacts(user_id)
+
+@app.route('/api/contacts/<user_id>/<contact_id>', methods=['PUT'])
+def contacts_update(user_id, contact_id):
+    return update_trusted_contact(user_id, contact_id)
 
-@app.route('/api/contacts/<user_id>/<int:contact_index>', methods=['DELETE'])
-def contacts_delete(user_id, contact_index):
-    return delete_trusted_contact(user_id, contact_index)
+@app.route('/api/contacts/<user_id>/<contact_id>', methods=['DELETE'])
+def contacts_delete(user_id, contact_id):
+    return delete_trusted_contact(user_id, contact_id)
 
 if __name__ == '__main__':
     # Get port from environment variable or default to 5000
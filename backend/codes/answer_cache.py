@@ -0,0 +1,202 @@
+import fcntl
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+from jsonl_store import JsonlStore
+
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize_question(question):
+    """Case-, punctuation- and whitespace-insensitive form used as the exact key."""
+    return " ".join(PUNCTUATION.sub(" ", question.casefold()).split())
+
+
+class AnswerCache:
+    """
+    Two-tier cache of generated answers.
+
+    get_exact() matches the normalized question text; get_similar() matches
+    a unit-length query embedding against cached questions and accepts the
+    best one above similarity_threshold. Entries are bounded by an LRU size
+    limit and a TTL, and every put is appended to a JSONL file so the cache
+    survives restarts (expired entries are skipped when it is loaded).
+
+    Answers are tied to the document index version they were generated
+    from: after set_index_version() only entries of that version are
+    served, so a re-indexed corpus needs no file rewrite. Several worker
+    processes may share the file; rewrites are serialized by a file lock
+    and keep the other workers' entries.
+    """
+
+    def __init__(self, path, max_entries=1000, ttl_seconds=86400, similarity_threshold=0.92):
+        self.store = JsonlStore(path, key=lambda record: record.get("key"))
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries = None
+        self._matrix = None
+        self._matrix_keys = None
+        self._lock = threading.Lock()
+        self.index_version = None
+        self.counters = {"lookups": 0, "exact_hits": 0, "semantic_hits": 0, "misses": 0, "puts": 0}
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        entries = OrderedDict()
+        now = time.time()
+        for record in self.store.records():
+            if record.get("answer") is not None and now - record["created_at"] < self.ttl_seconds:
+                entries[record["key"]] = record
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        self._entries = entries
+
+    def _fresh(self, entry):
+        return time.time() - entry["created_at"] < self.ttl_seconds
+
+    def _current(self, entry):
+        """Generated from the documents currently served."""
+        return self.index_version is not None and entry.get("index_version") == self.index_version
+
+    def set_index_version(self, version):
+        """Serve only answers generated from this document index version from now on."""
+        with self._lock:
+            if version != self.index_version:
+                self.index_version = version
+                self._matrix = None
+
+    def _evict(self, key):
+        del self._entries[key]
+        self._matrix = None
+
+    def _hit(self, key, kind):
+        self._entries.move_to_end(key)
+        self.counters[kind] += 1
+        return self._entries[key]["answer"]
+
+    def get_exact(self, question):
+        """Cached answer for the same normalized question, or None."""
+        key = normalize_question(question)
+        with self._lock:
+            self._load()
+            self.counters["lookups"] += 1
+            entry = self._entries.get(key)
+            if entry is not None and not self._fresh(entry):
+                self._evict(key)
+                entry = None
+            if entry is None or not self._current(entry):
+                return None
+            return self._hit(key, "exact_hits")
+
+    def get_similar(self, query_embedding):
+        """
+        Cached answer whose question embedding is closest to this one, if
+        the cosine similarity clears the threshold; counts a miss otherwise.
+        Call after get_exact() missed for the same question.
+        """
+        with self._lock:
+            self._load()
+            if self._matrix is None:
+                self._matrix_keys = [k for k, entry in self._entries.items() if self._current(entry)]
+                self._matrix = np.array([self._entries[k]["embedding"] for k in self._matrix_keys], dtype=np.float32)
+            if len(self._matrix_keys):
+                scores = self._matrix @ np.asarray(query_embedding, dtype=np.float32)
+                best = int(np.argmax(scores))
+                key = self._matrix_keys[best]
+                if scores[best] >= self.similarity_threshold and key in self._entries and self._fresh(self._entries[key]):
+                    return self._hit(key, "semantic_hits")
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, question, query_embedding, answer):
+        key = normalize_question(question)
+        entry = {
+            "key": key,
+            "question": question,
+            "embedding": [round(float(x), 5) for x in query_embedding],
+            "answer": answer,
+            "created_at": time.time(),
+            "index_version": self.index_version
+        }
+        with self._lock:
+            self._load()
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+            self.counters["puts"] += 1
+            # Under the file lock so a concurrent rewrite cannot drop it
+            with self._file_lock():
+                self.store.append([entry])
+            # The file only needs the live entries; drop the rest now and then
+            if self.store.superseded() + len(self.store) > 2 * self.max_entries + 100:
+                self._rewrite_store()
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.store.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _rewrite_store(self):
+        """
+        Replace the file with just the live entries: this worker's plus any
+        other worker appended since, newest first within max_entries.
+        """
+        with self._file_lock():
+            now = time.time()
+            live = {}
+            for record in JsonlStore(self.store.path, key=self.store.key, read_only=True).records():
+                if record.get("answer") is not None and now - record["created_at"] < self.ttl_seconds:
+                    live[record["key"]] = record
+            for key, entry in self._entries.items():
+                if key not in live or live[key]["created_at"] <= entry["created_at"]:
+                    live[key] = entry
+            records = sorted(live.values(), key=lambda record: record["created_at"])[-self.max_entries:]
+
+            # A unique name per writer; the file lock orders the replaces
+            tmp = JsonlStore(f"{self.store.path}.tmp-{os.getpid()}-{threading.get_ident()}", key=self.store.key)
+            for path in (tmp.path, tmp.index_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            if records:
+                tmp.append(records)
+                os.replace(tmp.index_path, self.store.index_path)
+                os.replace(tmp.path, self.store.path)
+            else:
+                for path in (self.store.path, self.store.index_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+            self.store = JsonlStore(self.store.path, key=self.store.key)
+
+    def clear(self):
+        """Forget every cached answer, in this worker and in the shared file."""
+        with self._lock:
+            self._load()
+            self._entries.clear()
+            self._matrix = None
+            with self._file_lock():
+                for path in (self.store.path, self.store.index_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self.store = JsonlStore(self.store.path, key=self.store.key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["lookups"]
+            hits = self.counters["exact_hits"] + self.counters["semantic_hits"]
+            return dict(
+                self.counters,
+                entries=len(self._entries) if self._entries is not None else None,
+                hit_rate=round(hits / lookups, 4) if lookups else None
+            )
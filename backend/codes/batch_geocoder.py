@@ -0,0 +1,145 @@
+import os
+import re
+import threading
+import time
+from jsonl_store import JsonlStore
+
+# Places already looked up, shared by every geocoding script. Each lookup is
+# appended as soon as it returns, so it doubles as the checkpoint of a run.
+DEFAULT_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "geocode_cache.jsonl")
+# Nominatim's usage policy allows one request per second
+DEFAULT_RATE = 1.0
+DEFAULT_BURST = 1
+# Places Nominatim could not find are retried after this many seconds
+NEGATIVE_TTL = 7 * 24 * 3600
+
+# extract_location joins several places with ", "
+COMPOSITE_SEPARATOR = re.compile(r"\s*[,;]\s*")
+
+
+class _LookupFailed:
+    def __repr__(self):
+        return "LOOKUP_FAILED"
+
+    def __bool__(self):
+        return False
+
+
+# Result of a place whose lookup raised (network, HTTP or rate-limit error);
+# unlike None ("no such place") it is never cached and callers should retry
+LOOKUP_FAILED = _LookupFailed()
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a call is allowed."""
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time.sleep((1 - self.tokens) / self.rate)
+
+
+def place_key(place):
+    return " ".join(place.split()).casefold()
+
+
+def split_locations(location_string):
+    """Individual places of a composite location string, deduplicated, in order."""
+    places = {}
+    for part in COMPOSITE_SEPARATOR.split(location_string or ""):
+        part = part.strip()
+        if part:
+            places.setdefault(place_key(part), part)
+    return list(places.values())
+
+
+class BatchGeocoder:
+    """
+    Geocodes many location strings with as few API calls as possible:
+    composite strings are split into places, each place is looked up once,
+    known places come from the cache and misses are paced by a token bucket
+    instead of a fixed sleep after every call.
+
+    lookup(place) returns a result dict, None when the place does not exist,
+    and raises on transient errors. Those come back as LOOKUP_FAILED, are
+    not cached, and callers keep the affected records for the next run.
+    """
+
+    def __init__(self, lookup, cache_file=DEFAULT_CACHE_FILE, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.lookup = lookup
+        self.cache = JsonlStore(cache_file, key=lambda record: record.get("place"))
+        self.bucket = TokenBucket(rate, burst)
+        self.stats = {"places": 0, "cache_hits": 0, "lookups": 0, "not_found": 0, "errors": 0}
+
+    def cached(self, place):
+        """(hit, result) for a place; expired negative entries count as misses."""
+        record = self.cache.get(place_key(place))
+        if record is None:
+            return False, None
+        if record["result"] is None and time.time() - record.get("cached_at", 0) > NEGATIVE_TTL:
+            return False, None
+        return True, record["result"]
+
+    def geocode_places(self, places):
+        """Result, None (not found) or LOOKUP_FAILED for each unique place."""
+        results = {}
+        for place in places:
+            key = place_key(place)
+            if key in results:
+                continue
+            self.stats["places"] += 1
+            hit, result = self.cached(place)
+            if hit:
+                self.stats["cache_hits"] += 1
+                results[key] = result
+                continue
+
+            self.bucket.acquire()
+            self.stats["lookups"] += 1
+            try:
+                result = self.lookup(place)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[!] Error geocoding {place}: {e}")
+                results[key] = LOOKUP_FAILED
+                continue
+            if result is None:
+                self.stats["not_found"] += 1
+            self.cache.append([{"place": key, "query": place, "result": result, "cached_at": time.time()}])
+            results[key] = result
+        return results
+
+    def geocode_many(self, location_strings):
+        """
+        Map each location string to the result of its first place that
+        resolves (places are listed in order of mention), None when none of
+        them exists, or LOOKUP_FAILED when a lookup failed before a place
+        resolved, since the answer might then differ on a retry.
+        """
+        places_by_string = {s: split_locations(s) for s in dict.fromkeys(location_strings) if s}
+        results = self.geocode_places(p for places in places_by_string.values() for p in places)
+
+        resolved = {}
+        for location_string, places in places_by_string.items():
+            resolved[location_string] = None
+            for place in places:
+                result = results[place_key(place)]
+                if result is not None:
+                    resolved[location_string] = result
+                    break
+        self.cache.maybe_compact()
+        return resolved
@@ -0,0 +1,34 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Inference backends for the sentence embedding model
+TORCH = "torch"
+ONNX = "onnx"
+QUANTIZED = "quantized"
+
+EMBEDDING_BACKENDS = (TORCH, ONNX, QUANTIZED)
+
+
+def load_embedding_model(model_name, backend=TORCH):
+    """
+    SentenceTransformer for CPU inference with the chosen backend. All three
+    expose the same encode() API:
+      torch      full-precision PyTorch model
+      onnx       ONNX Runtime export (sentence-transformers >= 3.2 with
+                 `pip install optimum[onnxruntime]`)
+      quantized  PyTorch with Linear layers dynamically quantized to int8
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; choose from {EMBEDDING_BACKENDS}")
+    if backend == ONNX:
+        return SentenceTransformer(model_name, device="cpu", backend="onnx")
+
+    model = SentenceTransformer(model_name, device="cpu")
+    if backend == QUANTIZED:
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    logger.info(f"Loaded {model_name} with the {backend} backend")
+    return model
@@ -0,0 +1,383 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+from vector_search import build_search_index, load_search_index, save_search_index, FilteredIndex, EXACT
+
+# Persisted chunk embeddings, one sub-directory per splitter/model config
+INDEX_DIR = os.path.join("data", "index")
+
+EMBEDDINGS_FILE = "embeddings.f32"
+CHUNKS_FILE = "chunks.jsonl"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+
+# Compact once this share of the stored rows belongs to removed or
+# replaced documents
+COMPACT_TOMBSTONE_RATIO = 0.3
+
+
+class Chunk:
+    """A retrieved text chunk; same attributes as a langchain Document."""
+
+    __slots__ = ("page_content", "metadata")
+
+    def __init__(self, page_content, metadata):
+        self.page_content = page_content
+        self.metadata = metadata
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def config_fingerprint(config):
+    """
+    Hash of everything that shapes chunks and their vectors (splitter
+    settings, embedding model). Changing any of it starts a new index;
+    document changes are applied to the existing one incrementally.
+    """
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+
+def index_path(fingerprint, index_dir=INDEX_DIR):
+    return os.path.join(index_dir, fingerprint)
+
+
+def prune_indexes(keep, index_dir=INDEX_DIR):
+    """Delete indexes built with other configs (open memmaps stay valid)."""
+    if not os.path.isdir(index_dir):
+        return
+    for name in os.listdir(index_dir):
+        if name != keep and not name.startswith("."):
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+
+
+def normalize_rows(matrix):
+    """Scale rows to unit length so cosine similarity is a dot product."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+class IndexSnapshot:
+    """
+    Read-only view of one index version. chunks and embeddings hold every
+    stored row of the current generation (embeddings is the shared
+    np.memmap), row i belonging to chunks[i]; rows in `tombstones` belong
+    to removed or replaced documents and must be skipped until the next
+    compaction drops them.
+    """
+
+    def __init__(self, chunks, embeddings, manifest):
+        self.chunks = chunks
+        self.embeddings = embeddings
+        self.manifest = manifest
+        self.version = manifest.get("version", 0)
+        self.tombstones = frozenset(manifest.get("tombstones", []))
+
+    @property
+    def live_count(self):
+        return len(self.chunks) - len(self.tombstones)
+
+    def live(self):
+        """(chunks, embeddings) without tombstoned rows; embeddings gathered into memory if needed."""
+        if not self.tombstones:
+            return self.chunks, self.embeddings
+        live = np.ones(len(self.chunks), dtype=bool)
+        live[sorted(self.tombstones)] = False
+        rows = np.flatnonzero(live)
+        return [self.chunks[i] for i in rows], np.ascontiguousarray(self.embeddings[rows])
+
+
+class EmbeddingIndex:
+    """
+    Incrementally updated embedding index in one directory.
+
+    Each generation directory (gen-<n>) holds an append-only float32
+    matrix, chunks.jsonl and the search structure for the configured
+    backend. manifest.json, replaced atomically, records the current
+    generation, how many rows are committed, which rows belong to which
+    document (by content hash), which rows are tombstoned because their
+    document changed or was removed, and which saved search index covers
+    how many rows. Readers only trust rows the manifest they read counts,
+    so appends never disturb them; compaction writes a new generation and
+    the old one is deleted a compaction later.
+
+    All writes happen under one file lock, so concurrent ingestions (API
+    workers starting together, the CLI) queue up instead of parsing and
+    embedding the same documents twice. The search index is likewise built
+    once, under the lock, by the process committing a version, and later
+    rows are add()ed to it rather than rebuilding it.
+    """
+
+    def __init__(self, path, search_backend=EXACT, search_params=None):
+        self.path = path
+        self.manifest_path = os.path.join(path, MANIFEST_FILE)
+        self.search_backend = search_backend
+        self.search_params = search_params or {}
+        self._thread_lock = threading.RLock()
+        self._lock_depth = 0
+
+    # -- reading ---------------------------------------------------------------
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def read_manifest(self):
+        if not self.exists():
+            return {"version": 0, "generation": 0, "count": 0, "chunks_bytes": 0, "dim": None, "documents": {}, "tombstones": [], "search": {}}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        manifest.setdefault("search", {})
+        return manifest
+
+    def version(self):
+        """Cheap check for servers polling for a new version."""
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _generation_dir(self, generation):
+        return os.path.join(self.path, f"gen-{generation}")
+
+    def _read_rows(self, manifest):
+        """(chunks, embeddings) of every row the manifest counts."""
+        count, dim = manifest["count"], manifest["dim"] or 0
+        gen_dir = self._generation_dir(manifest["generation"])
+        chunks = []
+        if not count:
+            return chunks, np.zeros((0, dim), dtype=np.float32)
+        with open(os.path.join(gen_dir, CHUNKS_FILE), "r", encoding="utf-8") as f:
+            for record in map(json.loads, f):
+                chunks.append(Chunk(record["text"], record["metadata"]))
+                if len(chunks) == count:
+                    break
+        embeddings = np.memmap(os.path.join(gen_dir, EMBEDDINGS_FILE), dtype=np.float32, mode="r", shape=(count, dim))
+        return chunks, embeddings
+
+    def snapshot(self):
+        manifest = self.read_manifest()
+        chunks, embeddings = self._read_rows(manifest)
+        return IndexSnapshot(chunks, embeddings, manifest)
+
+    def _search_entry(self, manifest):
+        """Saved search index of the current generation covering every row, or None."""
+        entry = manifest["search"].get(self.search_backend)
+        if entry and entry["generation"] == manifest["generation"] and entry["rows"] == manifest["count"]:
+            return entry
+        return None
+
+    def search_ready(self, snapshot):
+        return self.search_backend == EXACT or not snapshot.manifest["count"] or self._search_entry(snapshot.manifest) is not None
+
+    def search_index(self, snapshot):
+        """Search structure over the snapshot's rows with tombstoned rows filtered out."""
+        if self.search_backend == EXACT or not snapshot.manifest["count"]:
+            path = None
+        else:
+            entry = self._search_entry(snapshot.manifest)
+            if entry is None:
+                raise FileNotFoundError(f"No {self.search_backend} search index for version {snapshot.version}")
+            path = os.path.join(self.path, entry["path"])
+        backend = self.search_backend if path else EXACT
+        index = load_search_index(path, backend, snapshot.embeddings, self.search_params)
+        return FilteredIndex(index, snapshot.tombstones)
+
+    # -- writing ---------------------------------------------------------------
+
+    @contextmanager
+    def locked(self):
+        """
+        Exclusive access for writers, across processes (flock) and threads;
+        re-entrant, so a caller can plan and apply under one lock.
+        """
+        with self._thread_lock:
+            if self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, LOCK_FILE), "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self._lock_depth = 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth = 0
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write_manifest(self, manifest):
+        manifest["version"] = manifest.get("version", 0) + 1
+        manifest["updated_at"] = time.time()
+        tmp_file = self.manifest_path + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.manifest_path)
+
+    def _append_rows(self, gen_dir, start, chunks_bytes, chunks, embeddings):
+        """
+        Write rows after the committed ones, first dropping anything an
+        interrupted run left past them. Returns the new chunks file size.
+        """
+        os.makedirs(gen_dir, exist_ok=True)
+        row_bytes = embeddings.shape[1] * 4
+        with open(os.path.join(gen_dir, EMBEDDINGS_FILE), "ab") as f:
+            f.truncate(start * row_bytes)
+            f.write(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(os.path.join(gen_dir, CHUNKS_FILE), "ab") as f:
+            f.truncate(chunks_bytes)
+            f.write("".join(
+                json.dumps({"text": c.page_content, "metadata": c.metadata}, ensure_ascii=False, default=str) + "\n"
+                for c in chunks
+            ).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+    def _update_search(self, manifest):
+        """
+        Bring the configured backend's search index up to every committed
+        row: new rows are add()ed to the saved index of this generation; a
+        new generation (or backend) is built once. Caller holds the lock and
+        writes the manifest. Returns True if the manifest changed.
+        """
+        backend = self.search_backend
+        if backend == EXACT or not manifest["count"] or self._search_entry(manifest):
+            return False
+        _, vectors = self._read_rows(manifest)
+        entry = manifest["search"].get(backend)
+        if entry and entry["generation"] == manifest["generation"] and entry["rows"] < manifest["count"]:
+            index = load_search_index(os.path.join(self.path, entry["path"]), backend, vectors[:entry["rows"]], self.search_params)
+            index.add(vectors[entry["rows"]:])
+        else:
+            index = build_search_index(backend, vectors, self.search_params)
+
+        name = f"ann-{backend}-{manifest['count']}"
+        path = os.path.join(f"gen-{manifest['generation']}", name)
+        save_search_index(index, os.path.join(self.path, path))
+        manifest["search"][backend] = {"generation": manifest["generation"], "rows": manifest["count"], "path": path}
+
+        # Keep the previous index for readers still on the last version
+        keep = {name, os.path.basename(entry["path"]) if entry else None}
+        gen_dir = self._generation_dir(manifest["generation"])
+        for old in os.listdir(gen_dir):
+            if old.startswith(f"ann-{backend}-") and old not in keep:
+                shutil.rmtree(os.path.join(gen_dir, old), ignore_errors=True)
+        return True
+
+    def ensure_search_index(self):
+        """Build the configured backend's search index if the current version lacks one."""
+        with self.locked():
+            manifest = self.read_manifest()
+            if self._update_search(manifest):
+                self._write_manifest(manifest)
+
+    def apply(self, added, removed, meta=None):
+        """
+        Commit one ingestion run. added maps document path to
+        {"sha256", "chunks", "embeddings"}; removed lists document paths.
+        A re-added (changed) document's old rows are tombstoned. Returns
+        the new manifest.
+        """
+        with self.locked():
+            manifest = self.read_manifest()
+            if meta:
+                manifest.update(meta)
+            documents = manifest["documents"]
+            tombstones = set(manifest["tombstones"])
+
+            for doc in list(removed) + list(added):
+                old = documents.pop(doc, None)
+                if old:
+                    tombstones.update(range(*old["rows"]))
+
+            new_chunks, new_embeddings = [], []
+            row = manifest["count"]
+            for doc, entry in added.items():
+                count = len(entry["chunks"])
+                documents[doc] = {"sha256": entry["sha256"], "rows": [row, row + count], "chunks": count}
+                new_chunks.extend(entry["chunks"])
+                new_embeddings.append(np.asarray(entry["embeddings"], dtype=np.float32).reshape(count, -1))
+                row += count
+
+            if new_chunks:
+                embeddings = np.concatenate(new_embeddings)
+                manifest["dim"] = manifest["dim"] or int(embeddings.shape[1])
+                manifest["chunks_bytes"] = self._append_rows(
+                    self._generation_dir(manifest["generation"]), manifest["count"], manifest["chunks_bytes"],
+                    new_chunks, embeddings
+                )
+                manifest["count"] = row
+            manifest["tombstones"] = sorted(tombstones)
+
+            if manifest["count"] and len(tombstones) >= COMPACT_TOMBSTONE_RATIO * manifest["count"]:
+                old_generation = manifest["generation"]
+                self._compact(manifest)
+                self._update_search(manifest)
+                self._write_manifest(manifest)
+                self._drop_generations(old_generation)
+            else:
+                self._update_search(manifest)
+                self._write_manifest(manifest)
+            return manifest
+
+    def compact(self):
+        with self.locked():
+            manifest = self.read_manifest()
+            old_generation = manifest["generation"]
+            self._compact(manifest)
+            self._update_search(manifest)
+            self._write_manifest(manifest)
+            self._drop_generations(old_generation)
+            return manifest
+
+    def _compact(self, manifest):
+        """Copy live rows into a new generation and point the (unwritten) manifest at it."""
+        chunks, embeddings = IndexSnapshot(*self._read_rows(manifest), manifest).live()
+        live_rows = np.flatnonzero(~np.isin(np.arange(manifest["count"]), manifest["tombstones"]))
+        renumber = {int(old): new for new, old in enumerate(live_rows)}
+
+        generation = manifest["generation"] + 1
+        gen_dir = self._generation_dir(generation)
+        shutil.rmtree(gen_dir, ignore_errors=True)
+        chunks_bytes = 0
+        if len(chunks):
+            chunks_bytes = self._append_rows(gen_dir, 0, 0, chunks, embeddings)
+        else:
+            os.makedirs(gen_dir, exist_ok=True)
+
+        for entry in manifest["documents"].values():
+            start = renumber[entry["rows"][0]] if entry["chunks"] else 0
+            entry["rows"] = [start, start + entry["chunks"]]
+        manifest.update(generation=generation, count=len(live_rows), chunks_bytes=chunks_bytes, tombstones=[])
+
+    def _drop_generations(self, previous):
+        """Generations before the previous one can no longer be in use."""
+        for name in os.listdir(self.path):
+            if name.startswith("gen-") and int(name[4:]) < previous:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+
+def load_index(path):
+    """(chunks, embeddings, manifest) of the live rows of the current version of an index."""
+    snapshot = EmbeddingIndex(path).snapshot()
+    chunks, embeddings = snapshot.live()
+    return chunks, embeddings, snapshot.manifest
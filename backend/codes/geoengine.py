@@ -1,10 +1,17 @@
 import json
+import os
 import requests
-import time
+from jsonl_store import JsonlStore, default_key
+from batch_geocoder import BatchGeocoder, LOOKUP_FAILED
 
-# Input JSON file (from scraper)
-INPUT_FILE = "crime_locations.json"
-OUTPUT_FILE = "crime_locations_geocoded.json"
+# Input JSONL store (from scraper); legacy JSON files are imported once
+INPUT_FILE = "crime_locations.jsonl"
+LEGACY_INPUT_FILE = "crime_locations.json"
+OUTPUT_FILE = "crime_locations_geocoded.jsonl"
+LEGACY_OUTPUT_FILE = "crime_locations_geocoded.json"
+# Watermark into INPUT_FILE (articles before it have been processed) and
+# ids of articles whose location did not resolve yet
+STATE_FILE = "geocoder_state.json"
 
 NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
 
@@ -39,52 +46,121 @@ def get_bubble_radius(crime_type):
     crime_type = (crime_type or "crime").lower()
     return CRIME_BUBBLE_RADIUS.get(crime_type, 1000)
 
+def lookup_place(place):
+    """
+    Query Nominatim for one place. Returns None if it is not found and
+    raises on HTTP or network errors so they are retried later.
+    """
+    params = {
+        "q": place + ", Pune, India",
+        "format": "json",
+        "limit": 1
+    }
+    headers = {"User-Agent": "PuneCrimeSafetyApp/1.0"}
+    response = requests.get(NOMINATIM_URL, params=params, headers=headers, timeout=10)
+    response.raise_for_status()
+    data = response.json()
+    if not data:
+        return None
+    return {"latitude": float(data[0]["lat"]), "longitude": float(data[0]["lon"])}
+
 def geocode_location(location_string):
     """Use Nominatim API to get coordinates of a location"""
     try:
-        params = {
-            "q": location_string + ", Pune, India",
-            "format": "json",
-            "limit": 1
-        }
-        headers = {"User-Agent": "PuneCrimeSafetyApp/1.0"}
-        response = requests.get(NOMINATIM_URL, params=params, headers=headers)
-
-        if response.status_code == 200:
-            data = response.json()
-            if data:
-                return float(data[0]["lat"]), float(data[0]["lon"])
+        result = lookup_place(location_string)
+        if result:
+            return result["latitude"], result["longitude"]
     except Exception as e:
         print(f"[!] Error geocoding {location_string}: {e}")
     return None, None
 
+def load_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    tmp_file = STATE_FILE + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_file, STATE_FILE)
+
+
 def geocode_json():
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        articles = json.load(f)
+    """
+    Geocode articles the scraper appended since the last run, plus those
+    whose location did not resolve before. Only input past the saved
+    watermark is read and ids already in the output store are skipped.
+    Location strings are geocoded as one batch: each distinct place is
+    looked up once, cached places cost no request and misses are rate
+    limited (see batch_geocoder). Articles without coordinates are not
+    stored; their ids are kept in the state and retried on every run.
+    """
+    # The scraper writes the input store; only read it
+    articles = JsonlStore(INPUT_FILE, legacy_json_path=LEGACY_INPUT_FILE, read_only=True)
+    results = JsonlStore(OUTPUT_FILE, legacy_json_path=LEGACY_OUTPUT_FILE)
+    state = load_state()
 
-    results = []
-    for article in articles:
-        location = article.get("location_string")
-        if not location:
-            continue
+    previous = state.get("watermark")
+    changes, watermark, reset = articles.read_since(previous)
+    if reset and previous and previous.get("inode") != watermark.get("inode"):
+        print("[~] Input store was compacted; rescanning it (geocoded ids are skipped)")
+
+    if "unresolved" not in state:
+        # Earlier versions stored unresolved articles without coordinates
+        state["unresolved"] = [default_key(r) for r in results.records() if default_key(r) and r.get("latitude") is None]
 
-        lat, lon = geocode_location(location)
-        radius = get_bubble_radius(article.get("crime_type", "crime"))
+    # Articles are keyed by id; records without one (e.g. location-only
+    # samples) by their location string, same as in the stores
+    def needs_geocoding(article):
+        stored = results.get(default_key(article))
+        return article.get("location_string") and (stored is None or stored.get("latitude") is None)
 
-        article["latitude"] = lat
-        article["longitude"] = lon
-        article["bubble_radius"] = radius
+    pending = {}
+    for key in state["unresolved"]:
+        article = articles.get(key)
+        if article and needs_geocoding(article):
+            pending[key] = article
+    for _, article in changes:
+        if needs_geocoding(article):
+            pending[default_key(article)] = article
 
-        results.append(article)
-        print(f"[+] {location} -> {lat}, {lon} | Bubble: {radius}m")
+    # Every lookup is cached as it returns, so a crashed batch resumes
+    # from the cache instead of querying Nominatim again
+    geocoder = BatchGeocoder(lookup_place)
+    coordinates = geocoder.geocode_many(a["location_string"] for a in pending.values())
 
-        time.sleep(1)  # respect Nominatim API limits
+    geocoded = []
+    unresolved = []
+    for article in pending.values():
+        location = article["location_string"]
+        result = coordinates.get(location)
+        if result is LOOKUP_FAILED:
+            # Transient error: not stored, so the next run looks it up again
+            unresolved.append(default_key(article))
+            print(f"[!] {location} lookup failed; retrying next run")
+            continue
+        if result is None:
+            unresolved.append(default_key(article))
+            print(f"[-] {location} not found; retrying once the cached miss expires")
+            continue
+        article["latitude"] = result["latitude"]
+        article["longitude"] = result["longitude"]
+        article["bubble_radius"] = get_bubble_radius(article.get("crime_type", "crime"))
+        geocoded.append(article)
+        print(f"[+] {location} -> {article['latitude']}, {article['longitude']} | Bubble: {article['bubble_radius']}m")
+    added = results.append(geocoded)
 
-    # Save updated JSON
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    # A crash before this point only re-reads input; geocoded ids are skipped
+    state["watermark"] = watermark
+    state["unresolved"] = unresolved
+    save_state(state)
 
-    print(f"[✓] Geocoded + bubble data saved to {OUTPUT_FILE}")
+    results.maybe_compact()
+    print(f"[✓] Geocoded {added} new articles, {len(unresolved)} unresolved ({geocoder.stats}); bubble data saved to {OUTPUT_FILE}")
+    return added
 
 if __name__ == "__main__":
     geocode_json()
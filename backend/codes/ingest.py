@@ -0,0 +1,136 @@
+import argparse
+import glob
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from embedding_index import Chunk, file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Legal documents served by the assistant: every PDF in this directory
+DOCUMENTS_DIR = os.getenv("LEGAL_DOCS_DIR", "data")
+# Processes parsing PDFs in parallel
+PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def find_documents(roots):
+    """PDF files under the given files/directories."""
+    found = []
+    for root in roots:
+        if os.path.isdir(root):
+            found.extend(glob.glob(os.path.join(root, "**", "*.pdf"), recursive=True))
+        elif os.path.exists(root):
+            found.append(root)
+        else:
+            logger.warning(f"PDF file not found: {root}")
+    return sorted(set(os.path.normpath(p) for p in found))
+
+
+def under_roots(path, roots):
+    return any(path == root or path.startswith(root.rstrip(os.sep) + os.sep) for root in roots)
+
+
+def plan_changes(index, roots):
+    """
+    Compare the PDFs under roots with the index by content hash:
+    (changed, removed, hashes). changed holds new and modified documents;
+    removed holds indexed documents under roots that no longer exist.
+    """
+    roots = [os.path.normpath(root) for root in roots]
+    documents = index.read_manifest()["documents"]
+    hashes = {path: file_sha256(path) for path in find_documents(roots)}
+    changed = [path for path, digest in hashes.items() if documents.get(path, {}).get("sha256") != digest]
+    removed = [path for path in documents if path not in hashes and under_roots(path, roots)]
+    return changed, removed, hashes
+
+
+def parse_document(path, splitter_config):
+    """Load and split one PDF; runs in a worker process."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_community.document_loaders import PyPDFLoader
+
+    pages = PyPDFLoader(path).load()
+    splitter = RecursiveCharacterTextSplitter(length_function=len, **splitter_config)
+    return [(doc.page_content, doc.metadata) for doc in splitter.split_documents(pages)]
+
+
+def parse_documents(paths, splitter_config, workers=PARSE_WORKERS):
+    """{path: [(text, metadata), ...]} for the PDFs that could be parsed."""
+    parsed = {}
+    if not paths:
+        return parsed
+    if workers <= 1 or len(paths) == 1:
+        results = ((path, _safe_parse(path, splitter_config)) for path in paths)
+        return {path: chunks for path, chunks in results if chunks is not None}
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        futures = {path: pool.submit(parse_document, path, splitter_config) for path in paths}
+        for path, future in futures.items():
+            try:
+                parsed[path] = future.result()
+                logger.info(f"Parsed {path} into {len(parsed[path])} chunks")
+            except Exception as e:
+                logger.error(f"Error loading {path}: {e}")
+    return parsed
+
+
+def _safe_parse(path, splitter_config):
+    try:
+        return parse_document(path, splitter_config)
+    except Exception as e:
+        logger.error(f"Error loading {path}: {e}")
+        return None
+
+
+def ingest(index, roots, splitter_config, encode, meta=None):
+    """
+    Bring the index in line with the PDFs under roots (files or
+    directories): parse and embed only new or changed documents and
+    tombstone the chunks of changed and removed ones. encode(texts) must
+    return unit-length embeddings. Returns a summary.
+
+    Planning, parsing and committing happen under the index lock, so a
+    second process ingesting at the same time waits and then finds the
+    documents already indexed instead of embedding them again.
+    """
+    started = time.perf_counter()
+    with index.locked():
+        changed, removed, hashes = plan_changes(index, roots)
+        if not changed and not removed:
+            return {"changed": [], "removed": [], "chunks_added": 0, "seconds": round(time.perf_counter() - started, 2)}
+
+        parsed = parse_documents(changed, splitter_config)
+        added = {}
+        for path, pieces in parsed.items():
+            chunks = [Chunk(text, metadata) for text, metadata in pieces]
+            embeddings = encode([c.page_content for c in chunks]) if chunks else []
+            added[path] = {"sha256": hashes[path], "chunks": chunks, "embeddings": embeddings}
+
+        manifest = index.apply(added, removed, meta)
+    summary = {
+        "changed": sorted(added),
+        "removed": sorted(removed),
+        "failed": sorted(set(changed) - set(added)),
+        "chunks_added": sum(len(entry["chunks"]) for entry in added.values()),
+        "chunks_live": manifest["count"] - len(manifest["tombstones"]),
+        "version": manifest["version"],
+        "seconds": round(time.perf_counter() - started, 2)
+    }
+    logger.info(f"Ingestion finished: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Add, update or remove legal PDFs in the assistant's index")
+    parser.add_argument("paths", nargs="*", help=f"PDF files or directories (default: {DOCUMENTS_DIR}/)")
+    parser.add_argument("--compact", action="store_true", help="Drop tombstoned chunks after ingesting")
+    args = parser.parse_args()
+
+    # Same index, splitter and model as the running API, which swaps to the
+    # new version without a restart
+    from main import open_embedding_index, index_metadata, encode_texts, SPLITTER_CONFIG
+    embedding_index = open_embedding_index()
+    print(ingest(embedding_index, args.paths or [DOCUMENTS_DIR], SPLITTER_CONFIG, encode_texts, index_metadata()))
+    if args.compact:
+        embedding_index.compact()
@@ -0,0 +1,312 @@
+import json
+import os
+
+
+def default_key(record):
+    """Articles are keyed by id; location-only records by their location."""
+    return record.get("id") or record.get("location_string")
+
+
+class JsonlStore:
+    """
+    Append-only JSON Lines file with a persistent id index.
+
+    Records are appended as one JSON object per line, so saving new articles
+    costs O(new records) instead of rewriting the whole history. A sidecar
+    index file (<path>.idx, one "key<TAB>offset" line per record) makes
+    membership checks and lookups cheap without parsing the data file.
+    Appending a record with an existing key supersedes the old one;
+    compact() drops superseded lines.
+
+    Opened with read_only=True the store never writes: records past the
+    index are only indexed in memory and a legacy JSON file is read in place
+    instead of being imported. Readers must open stores another process
+    writes to this way.
+    """
+
+    def __init__(self, path, key=default_key, legacy_json_path=None, read_only=False):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.key = key
+        self.legacy_json_path = legacy_json_path
+        self.read_only = read_only
+        self._offsets = None
+        self._index_lines = 0
+        # Records found past the index file, indexed by the next append
+        self._unindexed = []
+        # (file version, records by key) of a legacy file read in place
+        self._legacy_cache = None
+
+    # -- index -------------------------------------------------------------
+
+    def _legacy_only(self):
+        return not os.path.exists(self.path) and self.legacy_json_path and os.path.exists(self.legacy_json_path)
+
+    def _ensure_imported(self):
+        if self._legacy_only() and not self.read_only:
+            self._import_legacy_json()
+
+    def _check_writable(self):
+        if self.read_only:
+            raise PermissionError(f"{self.path} was opened read-only")
+
+    def _load_index(self):
+        if self._offsets is not None:
+            return
+        self._ensure_imported()
+
+        offsets = {}
+        lines = 0
+        last_offset = -1
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    key, _, offset = line.rstrip("\n").rpartition("\t")
+                    if not key or not offset.isdigit():
+                        continue
+                    offsets[key] = int(offset)
+                    last_offset = max(last_offset, int(offset))
+                    lines += 1
+        self._offsets = offsets
+        self._index_lines = lines
+        self._unindexed = []
+        self._recover_tail(last_offset)
+
+    def _recover_tail(self, last_offset):
+        """
+        Index records appended after the index was last written (by a writer
+        still at work, or one that crashed) in memory only; the file is never
+        touched, and the writer's next append() persists the entries.
+        """
+        if not os.path.exists(self.path):
+            return
+        missing = []
+        with open(self.path, "rb") as f:
+            if last_offset >= 0:
+                f.seek(last_offset)
+                f.readline()
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if not line.endswith(b"\n"):
+                    # torn or in-progress write at the end of the file;
+                    # left for append() to terminate
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                missing.append((self.key(record), offset))
+        for key, offset in missing:
+            if key:
+                self._offsets[key] = offset
+                self._index_lines += 1
+        self._unindexed = missing
+
+    def _append_index(self, entries):
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write("".join(f"{key}\t{offset}\n" for key, offset in entries if key))
+        for key, offset in entries:
+            if key:
+                self._offsets[key] = offset
+                self._index_lines += 1
+
+    def _read_legacy_json(self):
+        with open(self.legacy_json_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _legacy_records(self):
+        """Records of a legacy file read in place, by key; re-read when it changes."""
+        stat = os.stat(self.legacy_json_path)
+        version = (stat.st_ino, stat.st_size, stat.st_mtime)
+        if self._legacy_cache is None or self._legacy_cache[0] != version:
+            records = {self.key(r): r for r in self._read_legacy_json() if self.key(r)}
+            self._legacy_cache = (version, records)
+        return self._legacy_cache[1]
+
+    def _import_legacy_json(self):
+        records = self._read_legacy_json()
+        self._offsets = {}
+        self.append(records)
+        self._offsets = None
+        print(f"[~] Imported {len(records)} records from {self.legacy_json_path}")
+
+    # -- public API ----------------------------------------------------------
+
+    def ids(self):
+        """Set-like view of stored keys."""
+        self._load_index()
+        return self._offsets.keys()
+
+    def __contains__(self, key):
+        self._load_index()
+        return key in self._offsets
+
+    def __len__(self):
+        self._load_index()
+        return len(self._offsets)
+
+    def get(self, key):
+        """Latest record stored under key, or None."""
+        if self.read_only and self._legacy_only():
+            return self._legacy_records().get(key)
+        self._load_index()
+        offset = self._offsets.get(key)
+        if offset is None:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def append(self, records):
+        """Append records in one write; returns how many were written."""
+        self._check_writable()
+        if self._offsets is None:
+            self._load_index()
+        if not records:
+            return 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        entries = []
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            chunks = []
+            if offset and not self._ends_with_newline():
+                # terminate a torn line left by a crash; readers skip it
+                chunks.append(b"\n")
+                offset += 1
+            for record in records:
+                line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+                entries.append((self.key(record), offset))
+                chunks.append(line)
+                offset += len(line)
+            f.write(b"".join(chunks))
+            f.flush()
+            os.fsync(f.fileno())
+        if self._unindexed:
+            # Already counted in memory by _recover_tail; only the file lacks them
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{key}\t{offset}\n" for key, offset in self._unindexed if key))
+            self._unindexed = []
+        self._append_index(entries)
+        return len(records)
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def iter_records(self, start_offset=0):
+        """
+        Yield (offset, record) for lines from start_offset on, including
+        superseded ones; callers that need the latest version use get().
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(start_offset)
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line or not line.endswith(b"\n"):
+                    break
+                try:
+                    yield offset, json.loads(line)
+                except ValueError:
+                    continue
+
+    def records(self):
+        """Latest version of every record, in file order."""
+        if self.read_only and self._legacy_only():
+            latest = {}
+            for i, record in enumerate(self._read_legacy_json()):
+                latest[self.key(record) or i] = record
+            yield from latest.values()
+            return
+        self._load_index()
+        latest = self._offsets
+        for offset, record in self.iter_records():
+            if latest.get(self.key(record)) == offset or self.key(record) is None:
+                yield record
+
+    def size(self):
+        """Current size of the data file in bytes (a watermark for readers)."""
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def watermark(self):
+        """
+        Position up to which a reader has seen the file. The inode changes
+        when compact() replaces the file, which invalidates old offsets.
+        """
+        if not os.path.exists(self.path):
+            return {"inode": None, "offset": 0}
+        stat = os.stat(self.path)
+        return {"inode": stat.st_ino, "offset": stat.st_size}
+
+    def read_since(self, watermark=None):
+        """
+        Records appended after a watermark, plus the watermark to resume from.
+        A missing or stale watermark (e.g. after compaction) reads from the
+        start, so readers must tolerate seeing records again.
+        Returns (list of (offset, record), new watermark, reset flag).
+        """
+        if self.read_only and self._legacy_only():
+            # Not imported yet: the legacy file is read whole, and only again
+            # once it was rewritten
+            stat = os.stat(self.legacy_json_path)
+            current = {"inode": stat.st_ino, "offset": 0, "legacy_size": stat.st_size, "legacy_mtime": stat.st_mtime}
+            if watermark == current:
+                return [], watermark, False
+            return list(enumerate(self._read_legacy_json())), current, True
+        self._ensure_imported()
+        current = self.watermark()
+        start = 0
+        reset = True
+        if watermark and watermark.get("inode") == current["inode"] and watermark.get("offset", 0) <= current["offset"]:
+            start = watermark["offset"]
+            reset = False
+
+        changes = []
+        end = start
+        for offset, record in self.iter_records(start):
+            changes.append((offset, record))
+        if changes:
+            with open(self.path, "rb") as f:
+                f.seek(changes[-1][0])
+                end = changes[-1][0] + len(f.readline())
+        return changes, {"inode": current["inode"], "offset": max(end, start)}, reset
+
+    def superseded(self):
+        """Number of index lines pointing at records that were replaced."""
+        self._load_index()
+        return self._index_lines - len(self._offsets)
+
+    def compact(self):
+        """Rewrite the data and index files without superseded records."""
+        self._check_writable()
+        self._load_index()
+        tmp_path = self.path + ".tmp"
+        tmp_index = self.index_path + ".tmp"
+        offsets = {}
+        with open(tmp_path, "wb") as out, open(tmp_index, "w", encoding="utf-8") as idx:
+            for record in self.records():
+                key = self.key(record)
+                offset = out.tell()
+                out.write((json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+                if key:
+                    idx.write(f"{key}\t{offset}\n")
+                    offsets[key] = offset
+        os.replace(tmp_path, self.path)
+        os.replace(tmp_index, self.index_path)
+        self._offsets = offsets
+        self._index_lines = len(offsets)
+        self._unindexed = []
+
+    def maybe_compact(self, min_superseded=500, ratio=0.5):
+        """Compact once superseded lines exceed both limits; returns True if it did."""
+        superseded = self.superseded()
+        if superseded >= min_superseded and superseded >= ratio * len(self):
+            self.compact()
+            return True
+        return False
@@ -0,0 +1,97 @@
+import threading
+import time
+
+COLD = "cold"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+# Every LazyResource created in this process, by name, for readiness reports
+_resources = {}
+
+
+class LazyResource:
+    """
+    A heavy object (model, client, index) built on first use instead of at
+    import time. get() builds it once, thread-safely; warm_up() builds it on
+    a background thread so a service can start serving at once and report
+    "warming" until the resource is ready. A failed build is retried on the
+    next get().
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.state = COLD
+        self.error = None
+        self.load_seconds = None
+        self._value = None
+        self._lock = threading.Lock()
+        _resources[name] = self
+
+    def get(self):
+        if self.state == READY:
+            return self._value
+        with self._lock:
+            if self.state == READY:
+                return self._value
+            self.state = WARMING
+            started = time.perf_counter()
+            try:
+                value = self.factory()
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                raise
+            self._value = value
+            self.load_seconds = time.perf_counter() - started
+            self.error = None
+            self.state = READY
+            return value
+
+    def peek(self):
+        """The resource if it is already built, else None; never blocks."""
+        return self._value if self.state == READY else None
+
+    def warm_up(self, background=True):
+        """Build the resource now, on a daemon thread unless background=False."""
+        def load():
+            try:
+                self.get()
+            except Exception as e:
+                print(f"[!] Warm-up of {self.name} failed: {e}")
+
+        if self.state in (READY, WARMING):
+            return
+        if not background:
+            load()
+            return
+        # Mark as warming right away so readiness checks do not report "cold"
+        self.state = WARMING
+        threading.Thread(target=load, name=f"warm-{self.name}", daemon=True).start()
+
+    def status(self):
+        return {
+            "state": self.state,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "error": self.error
+        }
+
+
+def readiness(names=None):
+    """
+    Overall state plus per-resource status. The overall state is "ready"
+    once every resource is, "failed" if any failed and "warming" otherwise.
+    """
+    resources = {name: r for name, r in _resources.items() if names is None or name in names}
+    states = {r.state for r in resources.values()}
+    if FAILED in states:
+        overall = FAILED
+    elif states <= {READY}:
+        overall = READY
+    else:
+        overall = WARMING
+    return {
+        "state": overall,
+        "resources": {name: r.status() for name, r in resources.items()}
+    }
@@ -1,42 +1,28 @@
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
 from dotenv import load_dotenv
-import os
 from langchain.tools import tool
+from llm_providers import build_router
+from lazy import LazyResource
 
 load_dotenv()
 
-os.environ['GROQ_API_KEY'] = os.getenv("GROQ_API_KEY")
-
-llm = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    temperature=0,
-    max_tokens=None,
-    timeout=None,
-    max_retries=2,
-    api_key = os.getenv("GROQ_API_KEY"),
-    
-)
-# Define a prompt template
-prompt_template = ChatPromptTemplate.from_messages(
-    [
-        ("system", "You are a helpful assistant."),
-        ("human", "{input}"),
-    ]
-)
-# Create a chain with the prompt template
-chain = prompt_template | llm
-# Define a function to use the chain
+# Groq first, falling back to Gemini, with the same deadlines, fallback
+# and latency-aware routing as the legal assistant. This router has its own
+# clients and latency stats. Built on first use so importing this module
+# works without API keys
+router = LazyResource("groq_router", lambda: build_router(
+    ["groq", "gemini"],
+    generation={"temperature": 0},
+    system="You are a helpful assistant."
+))
 
 @tool
 def ask_groq(query):
     """
-    Ask the Gemini agent a question and get the response.
+    Ask the LLM agent a question and get the response.
     """
-    response = chain.invoke({"input": query})
-    return response
+    return router.get().generate(query)
 
 
 if __name__ == "__main__":
     # Example usage
-    pass
\ No newline at end of file
+    pass
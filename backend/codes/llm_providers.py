@@ -0,0 +1,339 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# Providers in order of preference until latency data says otherwise:
+# "gemini", "groq" and "stub" (canned local answers for testing)
+LLM_PROVIDERS = [p.strip() for p in os.getenv("LLM_PROVIDERS", "gemini,groq").split(",") if p.strip()]
+# Deadline for one answer across every provider tried
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", os.getenv("GEMINI_TIMEOUT_SECONDS", "45")))
+# Send the prompt to the next provider too when the first one is slower
+# than its own p95; the first answer wins
+LLM_HEDGE = os.getenv("LLM_HEDGE", "1") != "0"
+# Recent calls per provider used for latency percentiles and error rate
+LLM_STATS_WINDOW = int(os.getenv("LLM_STATS_WINDOW", "100"))
+# A provider failing at least this share of recent calls is skipped for
+# LLM_COOLDOWN_SECONDS after its last failure, unless nothing else is left
+LLM_ERROR_THRESHOLD = float(os.getenv("LLM_ERROR_THRESHOLD", "0.5"))
+LLM_COOLDOWN_SECONDS = float(os.getenv("LLM_COOLDOWN_SECONDS", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+LLM_STUB_DELAY_SECONDS = float(os.getenv("LLM_STUB_DELAY_SECONDS", "0"))
+
+# Calls needed before a provider's latency percentiles are trusted
+MIN_SAMPLES = 5
+
+
+class LLMUnavailable(Exception):
+    """No provider produced an answer before the deadline."""
+
+
+class LLMProvider:
+    """
+    One LLM backend. Implementations create their client once and reuse it
+    (and its connection pool) for every call; timeout is the seconds left
+    of the caller's deadline.
+    """
+
+    name = None
+
+    def generate(self, prompt, timeout):
+        raise NotImplementedError
+
+    def stream(self, prompt, timeout):
+        """Yield the answer piece by piece as it is generated."""
+        yield self.generate(prompt, timeout)
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key, model=GEMINI_MODEL, generation=None, system=None):
+        import google.generativeai as genai
+
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY environment variable is required")
+        genai.configure(api_key=api_key)
+        self.genai = genai
+        self.model = genai.GenerativeModel(model)
+        self.generation = generation or {}
+        self.system = system
+
+    def _request(self, prompt, timeout, stream=False):
+        generation = self.generation
+        return self.model.generate_content(
+            f"{self.system}\n\n{prompt}" if self.system else prompt,
+            generation_config=self.genai.types.GenerationConfig(
+                temperature=generation.get("temperature"),
+                max_output_tokens=generation.get("max_tokens"),
+                top_p=generation.get("top_p"),
+                top_k=generation.get("top_k")
+            ),
+            request_options={"timeout": timeout},
+            stream=stream
+        )
+
+    def generate(self, prompt, timeout):
+        return self._request(prompt, timeout).text
+
+    def stream(self, prompt, timeout):
+        for chunk in self._request(prompt, timeout, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+class GroqProvider(LLMProvider):
+    name = "groq"
+
+    def __init__(self, api_key, model=GROQ_MODEL, generation=None, system=None):
+        from groq import Groq
+
+        if not api_key:
+            raise ValueError("GROQ_API_KEY environment variable is required")
+        # Retries are left to the router, which can try another provider instead
+        self.client = Groq(api_key=api_key, max_retries=0)
+        self.model = model
+        self.generation = generation or {}
+        self.system = system
+
+    def _request(self, prompt, timeout, stream=False):
+        messages = [{"role": "user", "content": prompt}]
+        if self.system:
+            messages.insert(0, {"role": "system", "content": self.system})
+        return self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.generation.get("temperature"),
+            max_tokens=self.generation.get("max_tokens"),
+            top_p=self.generation.get("top_p"),
+            timeout=timeout,
+            stream=stream
+        )
+
+    def generate(self, prompt, timeout):
+        return self._request(prompt, timeout).choices[0].message.content
+
+    def stream(self, prompt, timeout):
+        for chunk in self._request(prompt, timeout, stream=True):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class StubProvider(LLMProvider):
+    """Local canned answers, for tests and running without API keys."""
+
+    name = "stub"
+
+    def __init__(self, delay_seconds=LLM_STUB_DELAY_SECONDS, answer=None):
+        self.delay_seconds = delay_seconds
+        self.answer = answer
+
+    def generate(self, prompt, timeout):
+        time.sleep(min(self.delay_seconds, timeout))
+        return self.answer or f"Stub answer to a {len(prompt)}-character prompt."
+
+    def stream(self, prompt, timeout):
+        for word in self.generate(prompt, timeout).split(" "):
+            yield word + " "
+
+
+class ProviderStats:
+    """Latency and errors over a provider's last `window` calls."""
+
+    def __init__(self, window=LLM_STATS_WINDOW):
+        self._calls = deque(maxlen=window)  # (seconds, ok)
+        self._lock = threading.Lock()
+        self.last_failure = None
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self._calls.append((seconds, ok))
+            if not ok:
+                self.last_failure = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            calls = list(self._calls)
+        latencies = sorted(seconds for seconds, ok in calls if ok)
+
+        def percentile(q):
+            if len(latencies) < MIN_SAMPLES:
+                return None
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+        return {
+            "calls": len(calls),
+            "error_rate": sum(1 for _, ok in calls if not ok) / len(calls) if calls else 0.0,
+            "p50_seconds": percentile(0.5),
+            "p95_seconds": percentile(0.95)
+        }
+
+
+class LLMRouter:
+    """
+    Sends each prompt to the fastest healthy provider (by recent median
+    latency), hedges with the next one when the first runs past its own
+    p95, and falls back down the list on errors until the deadline.
+    """
+
+    def __init__(self, providers, timeout=LLM_TIMEOUT_SECONDS, hedge=LLM_HEDGE,
+                 error_threshold=LLM_ERROR_THRESHOLD, cooldown_seconds=LLM_COOLDOWN_SECONDS,
+                 max_concurrency=LLM_MAX_CONCURRENCY):
+        if not providers:
+            raise ValueError("At least one LLM provider is required")
+        self.providers = list(providers)
+        self.timeout = timeout
+        self.hedge = hedge
+        self.error_threshold = error_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.provider_stats = {p.name: ProviderStats() for p in self.providers}
+        self.counters = {"hedged": 0, "hedge_wins": 0, "fallbacks": 0, "failures": 0}
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+
+    def healthy(self, provider):
+        stats = self.provider_stats[provider.name]
+        if stats.snapshot()["error_rate"] < self.error_threshold or stats.last_failure is None:
+            return True
+        # Give a failing provider another try once it has rested
+        return time.monotonic() - stats.last_failure >= self.cooldown_seconds
+
+    def ranked(self):
+        """Healthy providers fastest first (untried ones get a chance first), then the rest."""
+        order = {p.name: i for i, p in enumerate(self.providers)}
+
+        def speed(provider):
+            p50 = self.provider_stats[provider.name].snapshot()["p50_seconds"]
+            return (p50 or 0.0, order[provider.name])
+
+        healthy = sorted((p for p in self.providers if self.healthy(p)), key=speed)
+        return healthy + [p for p in self.providers if p not in healthy]
+
+    def _call(self, provider, prompt, timeout):
+        started = time.monotonic()
+        try:
+            text = provider.generate(prompt, timeout)
+        except Exception:
+            self.provider_stats[provider.name].record(time.monotonic() - started, False)
+            raise
+        self.provider_stats[provider.name].record(time.monotonic() - started, True)
+        return text
+
+    def generate(self, prompt, timeout=None):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        candidates = self.ranked()
+        pending = {}  # future -> (provider, started)
+        errors = []
+
+        def launch():
+            provider = candidates[len(errors) + len(pending)]
+            future = self._executor.submit(self._call, provider, prompt, max(0.1, deadline - time.monotonic()))
+            pending[future] = (provider, time.monotonic())
+
+        launch()
+        while pending:
+            now = time.monotonic()
+            wait_seconds = deadline - now
+            if wait_seconds <= 0:
+                break
+            hedge_at = None
+            if self.hedge and len(pending) == 1 and len(errors) + 1 < len(candidates):
+                provider, started = next(iter(pending.values()))
+                p95 = self.provider_stats[provider.name].snapshot()["p95_seconds"]
+                if p95 is not None:
+                    hedge_at = started + p95
+                    wait_seconds = min(wait_seconds, max(0, hedge_at - now))
+
+            done, _ = wait(pending, timeout=wait_seconds, return_when=FIRST_COMPLETED)
+            if not done:
+                if hedge_at is not None and time.monotonic() >= hedge_at:
+                    self.counters["hedged"] += 1
+                    launch()
+                continue
+
+            for future in done:
+                provider, _ = pending.pop(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    logger.warning(f"LLM provider {provider.name} failed: {e}")
+                    errors.append(f"{provider.name}: {e}")
+                    continue
+                if provider is not candidates[0]:
+                    self.counters["hedge_wins" if len(errors) == 0 else "fallbacks"] += 1
+                return text
+
+            if not pending and len(errors) < len(candidates):
+                launch()
+
+        self.counters["failures"] += 1
+        raise LLMUnavailable("; ".join(errors) or f"No answer within {timeout or self.timeout}s")
+
+    def stream(self, prompt, timeout=None):
+        """
+        Stream from the fastest healthy provider. A provider failing before
+        its first piece of text is replaced by the next; once text has been
+        sent there is no switching.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        errors = []
+        for i, provider in enumerate(self.ranked()):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            stats = self.provider_stats[provider.name]
+            started = time.monotonic()
+            sent = False
+            try:
+                for text in provider.stream(prompt, remaining):
+                    sent = True
+                    yield text
+            except Exception as e:
+                stats.record(time.monotonic() - started, False)
+                logger.warning(f"LLM provider {provider.name} failed while streaming: {e}")
+                if sent:
+                    raise
+                errors.append(f"{provider.name}: {e}")
+                continue
+            stats.record(time.monotonic() - started, True)
+            if i:
+                self.counters["fallbacks"] += 1
+            return
+        self.counters["failures"] += 1
+        raise LLMUnavailable("; ".join(errors) or f"No answer within {timeout or self.timeout}s")
+
+    def stats(self):
+        return {
+            "providers": {name: stats.snapshot() for name, stats in self.provider_stats.items()},
+            **self.counters
+        }
+
+
+def build_router(names=None, generation=None, system=None, **router_options):
+    """
+    Router over the named providers (default LLM_PROVIDERS). Providers that
+    cannot be set up (missing API key or package) are skipped with a warning.
+    """
+    factories = {
+        "gemini": lambda: GeminiProvider(os.getenv("GEMINI_API_KEY"), generation=generation, system=system),
+        "groq": lambda: GroqProvider(os.getenv("GROQ_API_KEY"), generation=generation, system=system),
+        "stub": StubProvider
+    }
+    providers = []
+    for name in names or LLM_PROVIDERS:
+        if name not in factories:
+            raise ValueError(f"Unknown LLM provider {name!r}; choose from {sorted(factories)}")
+        try:
+            providers.append(factories[name]())
+        except Exception as e:
+            logger.warning(f"LLM provider {name} unavailable: {e}")
+    if not providers:
+        raise ValueError("No LLM provider could be initialized; set GEMINI_API_KEY or GROQ_API_KEY, or LLM_PROVIDERS=stub")
+    logger.info(f"LLM providers: {', '.join(p.name for p in providers)}")
+    return LLMRouter(providers, **router_options)
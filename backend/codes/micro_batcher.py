@@ -0,0 +1,79 @@
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single-item calls into batched calls.
+
+    Callers block in submit(item) while a background thread collects items
+    for up to max_wait_ms after the first one arrives (or until max_batch
+    items are waiting), runs batch_fn(items) once and hands each caller its
+    own result. batch_fn must return one result per item, in order.
+    """
+
+    def __init__(self, batch_fn, max_batch=16, max_wait_ms=5, name="micro-batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self.counters = {"items": 0, "batches": 0, "full_batches": 0, "errors": 0, "max_batch_seen": 0}
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def submit(self, item, timeout=None):
+        """Result of batch_fn for this item; re-raises batch_fn's exception."""
+        future = Future()
+        with self._cond:
+            self._ensure_thread()
+            self._pending.append((item, future))
+            self._cond.notify()
+        return future.result(timeout)
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            self.counters["batches"] += 1
+            self.counters["items"] += len(batch)
+            self.counters["full_batches"] += len(batch) == self.max_batch
+            self.counters["max_batch_seen"] = max(self.counters["max_batch_seen"], len(batch))
+            try:
+                results = self.batch_fn([item for item, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                self.counters["errors"] += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def stats(self):
+        batches = self.counters["batches"]
+        return dict(
+            self.counters,
+            max_batch=self.max_batch,
+            max_wait_ms=round(self.max_wait * 1000, 3),
+            mean_batch_size=round(self.counters["items"] / batches, 3) if batches else None,
+            mean_fill=round(self.counters["items"] / (batches * self.max_batch), 4) if batches else None
+        )
@@ -0,0 +1,42 @@
+import argparse
+import time
+from datetime import datetime
+
+from scraper import run_scraper
+from geoengine import geocode_json
+
+# Minutes between pipeline runs in --loop mode
+DEFAULT_INTERVAL_MINUTES = 5
+
+
+def run_pipeline():
+    """
+    One incremental pass: scrape new articles, then geocode only those.
+    Each stage keeps its own progress (feed validators, scraped ids, the
+    geocoder watermark), and the heatmap API picks up new geocoded rows on
+    its next request.
+    """
+    started = time.monotonic()
+    run_scraper()
+    geocoded = geocode_json()
+    print(f"[✓] Pipeline finished in {time.monotonic() - started:.1f}s ({geocoded} newly geocoded)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape -> geocode pipeline for the crime heatmap")
+    parser.add_argument("--loop", action="store_true", help="Keep running every --interval minutes")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL_MINUTES, help="Minutes between runs")
+    args = parser.parse_args()
+
+    while True:
+        try:
+            run_pipeline()
+        except Exception as e:
+            print(f"[!] Pipeline run failed @ {datetime.utcnow()}: {e}")
+        if not args.loop:
+            break
+        time.sleep(args.interval * 60)
+
+
+if __name__ == "__main__":
+    main()
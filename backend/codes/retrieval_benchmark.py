@@ -0,0 +1,123 @@
+import argparse
+import json
+import resource
+import time
+import numpy as np
+from embedding_index import load_index
+from embedder import load_embedding_model, TORCH, EMBEDDING_BACKENDS
+from vector_search import BruteForceIndex, build_search_index, EXACT, FLOAT16, INT8
+
+EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+
+
+def rss_bytes():
+    """Resident set size of this process (peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def index_nbytes(index):
+    """Bytes a search index keeps in memory, not counting the float32 memmap used for rescoring."""
+    if isinstance(index, BruteForceIndex):
+        return index.vectors.nbytes
+    return sum(
+        value.nbytes for name, value in vars(index).items()
+        if isinstance(value, np.ndarray) and name != "full"
+    )
+
+
+def load_queries(path, chunks, count, seed=0):
+    """Queries from a JSON list or text file, else the opening of random chunks."""
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                return json.load(f)[:count]
+            return [line.strip() for line in f if line.strip()][:count]
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(chunks), min(count, len(chunks)), replace=False)
+    return [chunks[i].page_content[:200] for i in picked]
+
+
+def run_benchmark(index_dir, backends, storages, queries_path=None, count=100, k=5):
+    chunks, vectors, meta = load_index(index_dir)
+    queries = load_queries(queries_path, chunks, count)
+    results = []
+    truth = None
+
+    for backend in [TORCH] + [b for b in backends if b != TORCH]:
+        rss_before = rss_bytes()
+        started = time.perf_counter()
+        model = load_embedding_model(meta.get("model", EMBEDDING_MODEL), backend)
+        load_seconds = time.perf_counter() - started
+        model_bytes = max(0, rss_bytes() - rss_before)
+
+        started = time.perf_counter()
+        embeddings = [model.encode(q, convert_to_numpy=True, normalize_embeddings=True) for q in queries]
+        encode_qps = len(queries) / (time.perf_counter() - started)
+
+        if truth is None:
+            # Full-precision model + exact search is the reference for recall
+            exact = BruteForceIndex(vectors)
+            truth = [exact.search(e, k)[0] for e in embeddings]
+
+        for storage in storages:
+            index = build_search_index(storage, vectors)
+            started = time.perf_counter()
+            found = [index.search(e, k)[0] for e in embeddings]
+            search_qps = len(queries) / (time.perf_counter() - started)
+            recall = np.mean([len(set(f.tolist()) & set(t.tolist())) / max(1, len(t)) for f, t in zip(found, truth)])
+            results.append({
+                "embedding_backend": backend,
+                "storage": storage,
+                "model_load_seconds": round(load_seconds, 2),
+                "model_memory_mb": round(model_bytes / 2**20, 1),
+                "index_memory_mb": round(index_nbytes(index) / 2**20, 2),
+                "encode_qps": round(encode_qps, 1),
+                "search_qps": round(search_qps, 1),
+                "end_to_end_qps": round(1 / (1 / encode_qps + 1 / search_qps), 1),
+                f"recall@{k}": round(float(recall), 4)
+            })
+        if backend not in backends:
+            # The reference model was only loaded to compute ground truth
+            results = [r for r in results if r["embedding_backend"] != backend]
+        del model
+    return results
+
+
+def print_table(results):
+    columns = list(results[0]) if results else []
+    widths = [max(len(c), *(len(str(r[c])) for r in results)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for r in results:
+        print("  ".join(str(r[c]).ljust(w) for c, w in zip(columns, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare embedding backends and vector storage for the legal assistant")
+    parser.add_argument("index_dir", help="Embedding index directory (data/index/<fingerprint>)")
+    parser.add_argument("--backends", default=",".join(EMBEDDING_BACKENDS), help="Comma-separated embedding backends")
+    parser.add_argument("--storage", default=",".join([EXACT, FLOAT16, INT8]), help="Comma-separated search backends")
+    parser.add_argument("--queries", help="JSON list or text file of questions (default: samples from the corpus)")
+    parser.add_argument("--count", type=int, default=100, help="Number of queries")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        args.index_dir,
+        [b for b in args.backends.split(",") if b],
+        [s for s in args.storage.split(",") if s],
+        args.queries,
+        args.count,
+        args.k
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(report)
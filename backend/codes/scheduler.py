@@ -0,0 +1,295 @@
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scraper import (
+    RSS_FEEDS, open_store, load_feed_state, save_feed_state,
+    download_feed, ingest_results, entry_published, NLP
+)
+from lazy import readiness
+
+# Poll interval bounds per feed, in seconds
+MIN_INTERVAL = 120
+MAX_INTERVAL = 3600
+INITIAL_INTERVAL = 600
+# Poll about this many times per expected new entry
+POLLS_PER_ENTRY = 2
+# Growth factor when a feed comes back unchanged
+NOT_MODIFIED_GROWTH = 1.5
+# Error backoff: base * 2^failures, capped, with +-50% jitter
+ERROR_BACKOFF_BASE = 60
+MAX_ERROR_BACKOFF = 3 * 3600
+# +-10% jitter on every interval so feeds do not synchronise
+INTERVAL_JITTER = 0.1
+# Feeds downloaded at the same time
+MAX_CONCURRENT_FETCHES = 2
+# Recent entries used to estimate a feed's publish rate
+RATE_SAMPLE_ENTRIES = 10
+
+METRICS_FILE = "scheduler_metrics.json"
+
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+
+def clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def jittered(seconds, spread=INTERVAL_JITTER):
+    return seconds * random.uniform(1 - spread, 1 + spread)
+
+
+def publish_interval(feed):
+    """
+    Mean gap in seconds between the feed's most recent entries, or None if
+    the feed does not carry enough publish dates.
+    """
+    published = sorted(
+        (p for p in (entry_published(entry) for entry in feed.entries) if p),
+        reverse=True
+    )[:RATE_SAMPLE_ENTRIES]
+    if len(published) < 2:
+        return None
+    span = (published[0] - published[-1]).total_seconds()
+    return span / (len(published) - 1) if span > 0 else None
+
+
+def cache_lifetime(headers):
+    """Seconds the server says the feed stays fresh (Cache-Control / Expires)."""
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    match = MAX_AGE_PATTERN.search(headers.get("cache-control", ""))
+    if match:
+        return int(match.group(1))
+    if headers.get("expires") and headers.get("date"):
+        try:
+            expires = parsedate_to_datetime(headers["expires"])
+            date = parsedate_to_datetime(headers["date"])
+            return max(0, int((expires - date).total_seconds()))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+class FeedSchedule:
+    """Polling state and metrics of one feed."""
+
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        self.interval = INITIAL_INTERVAL
+        self.next_due = time.monotonic()
+        self.failures = 0
+        self.fetches = 0
+        self.new_articles = 0
+        self.last_status = None
+        self.last_error = None
+        self.last_fetch_at = None
+        self.last_success_at = None
+        self.last_duration = None
+        self.avg_duration = None
+        self.last_lag = None
+
+    def record_fetch(self, result, new_articles):
+        now = datetime.utcnow()
+        duration = result["duration"]
+        self.fetches += 1
+        self.last_status = result["status"]
+        self.last_fetch_at = now
+        self.last_duration = duration
+        self.avg_duration = duration if self.avg_duration is None else 0.8 * self.avg_duration + 0.2 * duration
+
+        if result["status"] == "error":
+            self.failures += 1
+            self.last_error = result.get("error")
+            backoff = min(MAX_ERROR_BACKOFF, ERROR_BACKOFF_BASE * 2 ** (self.failures - 1))
+            self.next_due = time.monotonic() + jittered(backoff, 0.5)
+            return
+
+        self.failures = 0
+        self.last_error = None
+        self.last_success_at = now
+        self.new_articles += len(new_articles)
+
+        # Publish-to-ingest lag of the newest article we just stored
+        lags = [
+            (now - datetime.fromisoformat(a["published"])).total_seconds()
+            for a in new_articles if a.get("published")
+        ]
+        if lags:
+            self.last_lag = min(lags)
+
+        if result["status"] == "not_modified":
+            interval = self.interval * NOT_MODIFIED_GROWTH
+        else:
+            gap = publish_interval(result["feed"])
+            interval = gap / POLLS_PER_ENTRY if gap else self.interval
+
+        # Never poll before the server says the feed can change
+        lifetime = cache_lifetime(result.get("headers"))
+        if lifetime:
+            interval = max(interval, lifetime)
+
+        self.interval = clamp(interval, MIN_INTERVAL, MAX_INTERVAL)
+        self.next_due = time.monotonic() + jittered(self.interval)
+
+    def metrics(self):
+        now = datetime.utcnow()
+        return {
+            "url": self.url,
+            "interval_seconds": round(self.interval, 1),
+            "next_poll_in_seconds": round(max(0.0, self.next_due - time.monotonic()), 1),
+            "last_status": self.last_status,
+            "last_error": self.last_error,
+            "consecutive_failures": self.failures,
+            "fetches": self.fetches,
+            "new_articles": self.new_articles,
+            "last_fetch_at": self.last_fetch_at.isoformat() if self.last_fetch_at else None,
+            "seconds_since_success": round((now - self.last_success_at).total_seconds(), 1) if self.last_success_at else None,
+            "last_fetch_duration_seconds": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "avg_fetch_duration_seconds": round(self.avg_duration, 3) if self.avg_duration is not None else None,
+            "last_publish_lag_seconds": round(self.last_lag, 1) if self.last_lag is not None else None
+        }
+
+
+class ScrapeScheduler:
+    """
+    Long-running scraper: each feed is polled on its own adaptive interval,
+    downloads run on a small thread pool and NLP + storage run on the
+    scheduler thread.
+    """
+
+    def __init__(self, feeds=RSS_FEEDS, max_concurrent=MAX_CONCURRENT_FETCHES, on_new_articles=None):
+        self.feeds = {name: FeedSchedule(name, url) for name, url in feeds.items()}
+        self.max_concurrent = max_concurrent
+        self.on_new_articles = on_new_articles
+        self.store = open_store()
+        self.existing_ids = set(self.store.ids())
+        self.state = load_feed_state()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "generated_at": datetime.utcnow().isoformat(),
+                "articles_stored": len(self.existing_ids),
+                "models": readiness()["resources"],
+                "feeds": {name: feed.metrics() for name, feed in self.feeds.items()}
+            }
+
+    def write_metrics(self):
+        tmp_file = METRICS_FILE + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.metrics(), f, indent=2)
+        os.replace(tmp_file, METRICS_FILE)
+
+    def stop(self):
+        self._stop.set()
+
+    def _handle(self, result):
+        feed = self.feeds[result["name"]]
+        new_articles = []
+        try:
+            new_articles = ingest_results([result], self.store, self.state, self.existing_ids)
+            save_feed_state(self.state)
+        except Exception as e:
+            result = dict(result, status="error", error=f"processing failed: {e}")
+        with self._lock:
+            feed.record_fetch(result, new_articles)
+        if new_articles:
+            print(f"[✓] {feed.name}: {len(new_articles)} new articles, next poll in {feed.interval:.0f}s")
+            self.store.maybe_compact()
+            if self.on_new_articles:
+                try:
+                    self.on_new_articles(new_articles)
+                except Exception as e:
+                    print(f"[!] New-article hook failed: {e}")
+
+    def run(self):
+        print(f"=== Scrape scheduler started @ {datetime.utcnow()} ({len(self.feeds)} feeds) ===")
+        # Load spaCy while the first feeds download
+        NLP.warm_up()
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrent) as pool:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                busy = set(in_flight.values())
+                due = sorted(
+                    (f for f in self.feeds.values() if f.next_due <= now and f.name not in busy),
+                    key=lambda f: f.next_due
+                )
+                for feed in due[:self.max_concurrent - len(in_flight)]:
+                    future = pool.submit(download_feed, feed.name, feed.url, self.state.get(feed.name))
+                    in_flight[future] = feed.name
+
+                busy = set(in_flight.values())
+                next_due = min((f.next_due for f in self.feeds.values() if f.name not in busy), default=now + 60)
+                timeout = clamp(next_due - time.monotonic(), 0.5, 60)
+                if not in_flight:
+                    self._stop.wait(timeout)
+                    continue
+
+                done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del in_flight[future]
+                    self._handle(future.result())
+                if done:
+                    self.write_metrics()
+
+
+def serve_metrics(scheduler, port):
+    """Expose scheduler.metrics() as JSON on http://0.0.0.0:<port>/metrics."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = json.dumps(scheduler.metrics()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"[~] Scheduler metrics on http://0.0.0.0:{port}/metrics")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive per-feed crime scraper daemon")
+    parser.add_argument("--max-concurrent", type=int, default=MAX_CONCURRENT_FETCHES, help="Feeds fetched at once")
+    parser.add_argument("--metrics-port", type=int, help="Serve per-feed metrics over HTTP on this port")
+    parser.add_argument("--geocode", action="store_true", help="Geocode new articles as they arrive")
+    args = parser.parse_args()
+
+    on_new_articles = None
+    if args.geocode:
+        from geoengine import geocode_json
+        on_new_articles = lambda articles: geocode_json()
+
+    scheduler = ScrapeScheduler(max_concurrent=args.max_concurrent, on_new_articles=on_new_articles)
+    if args.metrics_port:
+        serve_metrics(scheduler, args.metrics_port)
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        print("[=] Scheduler stopped")
+
+
+if __name__ == "__main__":
+    main()
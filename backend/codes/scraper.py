@@ -1,12 +1,28 @@
+import calendar
 import feedparser
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import hashlib
-import en_core_web_sm
+import requests
+from text_matcher import PhraseMatcher
+from jsonl_store import JsonlStore
+from lazy import LazyResource
 
-# Load spaCy model
-nlp = en_core_web_sm.load()
+# spaCy model with only what NER needs; tagging, parsing and
+# lemmatization are never used here
+NER_EXCLUDED_COMPONENTS = ["tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
+
+
+def load_nlp():
+    import en_core_web_sm
+    return en_core_web_sm.load(exclude=NER_EXCLUDED_COMPONENTS)
+
+
+# Loaded on the first article that needs NER, not at import
+NLP = LazyResource("spacy", load_nlp)
 
 # RSS feed URLs
 RSS_FEEDS = {
@@ -16,12 +32,17 @@ RSS_FEEDS = {
     "Pune Mirror": "https://punemirror.com/feed/"
 }
 
-# Crime keywords
-CRIME_KEYWORDS = [
-    "theft", "robbery", "assault", "murder", "kidnap", "chain snatching",
-    "burglary", "violence", "rape", "molestation", "fraud", "attack",
-    "shooting", "arrested", "gang", "गुन्हा", "चोरी", "हत्या", "लुट", "अपहरण"
-]
+# Crime keywords mapped to the crime type they indicate
+CRIME_KEYWORDS = {
+    "theft": "theft", "robbery": "robbery", "assault": "assault",
+    "murder": "murder", "kidnap": "kidnap", "chain snatching": "chain snatching",
+    "burglary": "burglary", "violence": "assault", "rape": "rape",
+    "molestation": "molestation", "fraud": "fraud", "attack": "attack",
+    "shooting": "shooting", "arrested": "crime", "gang": "gang",
+    "गुन्हा": "crime", "चोरी": "theft", "हत्या": "murder", "लुट": "robbery", "अपहरण": "kidnap"
+}
+# Crime type used when only generic keywords match
+GENERIC_CRIME_TYPE = "crime"
 
 # Gazetteer of Pune localities
 PUNE_LOCALITIES = [
@@ -32,31 +53,106 @@ PUNE_LOCALITIES = [
     "Camp", "Laxmi Road", "Sinhagad Road" ,"Alandi"
 ]
 
-OUTPUT_FILE = "crime_locations.json"
+# Append-only article store; the old pretty-printed JSON is imported once
+OUTPUT_FILE = "crime_locations.jsonl"
+LEGACY_OUTPUT_FILE = "crime_locations.json"
+# ETag / Last-Modified per feed, so unchanged feeds come back as 304
+FEED_STATE_FILE = "feed_state.json"
+
+# (connect, read) timeouts for a single feed download, in seconds
+FEED_TIMEOUT = (5, 20)
+MAX_FETCH_WORKERS = 4
+USER_AGENT = "PuneCrimeSafetyApp/1.0"
+
+CRIME = "crime"
+LOCALITY = "locality"
+
+
+def build_matcher():
+    """One automaton over crime keywords and the locality gazetteer."""
+    matcher = PhraseMatcher()
+    for keyword, crime_type in CRIME_KEYWORDS.items():
+        # keywords also match inflections ("kidnapped", "attacks")
+        matcher.add(keyword, (CRIME, crime_type), whole_word=False)
+    for locality in PUNE_LOCALITIES:
+        matcher.add(locality, (LOCALITY, locality))
+    matcher.build()
+    return matcher
+
+
+MATCHER = build_matcher()
+
+# nlp.pipe settings for the NER stage
+NER_BATCH_SIZE = 64
+NER_PROCESSES = int(os.getenv("SCRAPER_NER_PROCESSES", 1))
+
+
+def scan_text(text):
+    """
+    Single pass over the text for crime keywords and known localities.
+    Returns (crime_type or None, list of localities in order of appearance).
+    """
+    crime_types = []
+    localities = []
+    for _, _, (kind, value) in MATCHER.find(text):
+        if kind == CRIME:
+            crime_types.append(value)
+        else:
+            localities.append(value)
+
+    localities = list(dict.fromkeys(localities))
+    if not crime_types:
+        return None, localities
+    specific = [t for t in crime_types if t != GENERIC_CRIME_TYPE]
+    return (specific[0] if specific else GENERIC_CRIME_TYPE), localities
 
 
 def is_crime_related(text):
-    text = text.lower()
-    return any(kw in text for kw in CRIME_KEYWORDS)
+    return scan_text(text)[0] is not None
 
 
-def extract_location(text):
-    """Extract sub-location (ignore generic 'Pune')."""
-    locations = []
+def gazetteer_locations(text):
+    """Known Pune localities mentioned in the text."""
+    return scan_text(text)[1]
+
 
-    # Gazetteer check
-    for loc in PUNE_LOCALITIES:
-        if loc.lower() in text.lower():
-            locations.append(loc)
+def ner_locations(doc):
+    """GPE/LOC entities of a spaCy doc, ignoring generic 'Pune'."""
+    return [
+        ent.text for ent in doc.ents
+        if ent.label_ in ["GPE", "LOC"] and ent.text.lower() != "pune"
+    ]
 
-    # spaCy NER
-    doc = nlp(text)
-    for ent in doc.ents:
-        if ent.label_ in ["GPE", "LOC"]:
-            if ent.text.lower() != "pune":  # ignore plain Pune
-                locations.append(ent.text)
 
-    return ", ".join(set(locations)) if locations else None
+def join_locations(locations):
+    return ", ".join(dict.fromkeys(locations)) if locations else None
+
+
+def extract_locations(texts, gazetteer_hits=None):
+    """
+    Extract sub-locations for many texts at once.
+    Texts with a gazetteer match skip NER; the rest go through nlp.pipe in
+    batches (optionally across processes). gazetteer_hits can pass matches
+    already found by scan_text.
+    """
+    if gazetteer_hits is None:
+        gazetteer_hits = [gazetteer_locations(text) for text in texts]
+    locations = [list(found) for found in gazetteer_hits]
+    pending = [i for i, found in enumerate(locations) if not found]
+    if pending:
+        docs = NLP.get().pipe(
+            (texts[i] for i in pending),
+            batch_size=NER_BATCH_SIZE,
+            n_process=NER_PROCESSES
+        )
+        for i, doc in zip(pending, docs):
+            locations[i] = ner_locations(doc)
+    return [join_locations(found) for found in locations]
+
+
+def extract_location(text):
+    """Extract sub-location (ignore generic 'Pune')."""
+    return extract_locations([text])[0]
 
 
 def make_id(entry):
@@ -65,57 +161,199 @@ def make_id(entry):
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
+def open_store():
+    return JsonlStore(OUTPUT_FILE, legacy_json_path=LEGACY_OUTPUT_FILE)
+
+
 def load_existing():
-    if os.path.exists(OUTPUT_FILE):
-        with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
+    return list(open_store().records())
+
+
+def load_feed_state():
+    if os.path.exists(FEED_STATE_FILE):
+        with open(FEED_STATE_FILE, "r", encoding="utf-8") as f:
             return json.load(f)
-    return []
+    return {}
 
 
-def fetch_feed(name, url, existing_ids):
-    feed = feedparser.parse(url)
-    articles = []
+def save_feed_state(state):
+    tmp_file = FEED_STATE_FILE + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, FEED_STATE_FILE)
+
+
+def download_feed(name, url, feed_state=None):
+    """
+    Conditional GET of one feed.
+    Returns a dict with status "ok", "not_modified" or "error", the parsed
+    feed (for "ok"), the new etag/last_modified and the fetch duration.
+    """
+    feed_state = feed_state or {}
+    headers = {"User-Agent": USER_AGENT}
+    if feed_state.get("etag"):
+        headers["If-None-Match"] = feed_state["etag"]
+    if feed_state.get("last_modified"):
+        headers["If-Modified-Since"] = feed_state["last_modified"]
+
+    result = {
+        "name": name,
+        "url": url,
+        "feed": None,
+        "etag": feed_state.get("etag"),
+        "last_modified": feed_state.get("last_modified"),
+        "bytes": 0
+    }
+    started = time.monotonic()
+    try:
+        response = requests.get(url, headers=headers, timeout=FEED_TIMEOUT)
+        if response.status_code == 304:
+            result["status"] = "not_modified"
+        else:
+            response.raise_for_status()
+            result["status"] = "ok"
+            result["bytes"] = len(response.content)
+            result["feed"] = feedparser.parse(response.content)
+            result["etag"] = response.headers.get("ETag")
+            result["last_modified"] = response.headers.get("Last-Modified")
+        result["headers"] = dict(response.headers)
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    result["duration"] = time.monotonic() - started
+    return result
+
+
+def download_feeds(feeds, state):
+    """Download several feeds concurrently; returns results in feed order."""
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(feeds)) or 1) as pool:
+        futures = {
+            pool.submit(download_feed, name, url, state.get(name)): name
+            for name, url in feeds.items()
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results[result["name"]] = result
+    return [results[name] for name in feeds]
+
+
+def entry_published(entry):
+    """Publish time of a feed entry as a UTC datetime, if the feed gives one."""
+    parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+    if not parsed:
+        return None
+    return datetime.utcfromtimestamp(calendar.timegm(parsed))
+
+
+def collect_candidates(name, feed, existing_ids, claimed_ids):
+    """
+    Unseen crime-related entries of a parsed feed, before location lookup.
+    Their ids are added to claimed_ids so other feeds in the same batch skip
+    duplicates; existing_ids is left alone until the articles are stored.
+    """
+    candidates = []
 
     for entry in feed.entries:
+        article_id = make_id(entry)
+        if article_id in existing_ids or article_id in claimed_ids:
+            continue
+
         title = entry.get("title", "")
         summary = entry.get("summary", "")
         full_text = title + " " + summary
 
-        if is_crime_related(full_text):
-            location = extract_location(full_text)
-            if location:  # only keep if specific location found
-                article = {
-                    "id": make_id(entry),
-                    "location_string": location,
-                    "summary": summary,
-                    "link": entry.get("link", ""),
-                    "source": name,
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-                if article["id"] not in existing_ids:
-                    articles.append(article)
-                    print(f"[+] {location} | {summary[:60]}...")
+        crime_type, localities = scan_text(full_text)
+        if crime_type:
+            claimed_ids.add(article_id)
+            candidates.append({
+                "id": article_id,
+                "text": full_text,
+                "crime_type": crime_type,
+                "localities": localities,
+                "published": entry_published(entry),
+                "summary": summary,
+                "link": entry.get("link", ""),
+                "source": name
+            })
+
+    return candidates
+
+
+def locate_candidates(candidates):
+    """Attach locations in one batched NLP pass; drop entries without one."""
+    articles = []
+    locations = extract_locations(
+        [c["text"] for c in candidates],
+        [c["localities"] for c in candidates]
+    )
+
+    for candidate, location in zip(candidates, locations):
+        if location:  # only keep if specific location found
+            article = {
+                "id": candidate["id"],
+                "location_string": location,
+                "crime_type": candidate["crime_type"],
+                "summary": candidate["summary"],
+                "link": candidate["link"],
+                "source": candidate["source"],
+                "timestamp": datetime.utcnow().isoformat()
+            }
+            if candidate["published"]:
+                article["published"] = candidate["published"].isoformat()
+            articles.append(article)
+            print(f"[+] {location} | {candidate['summary'][:60]}...")
 
     return articles
 
 
+def ingest_results(results, store, state, existing_ids):
+    """
+    Store the new articles from a set of download results and return them.
+    The per-feed validators in state and the ids in existing_ids are only
+    updated once the articles are stored, so a failure leaves both as they
+    were and the next fetch sees the same entries again.
+    """
+    candidates = []
+    validators = {}
+    claimed_ids = set()
+    for result in results:
+        name = result["name"]
+        if result["status"] == "error":
+            print(f"[!] {name}: {result['error']}")
+            continue
+        validators[name] = {"etag": result["etag"], "last_modified": result["last_modified"]}
+        if result["status"] == "not_modified":
+            print(f"[=] {name}: not modified ({result['duration']:.1f}s)")
+            continue
+        print(f"[~] {name}: {result['bytes']} bytes ({result['duration']:.1f}s)")
+        candidates.extend(collect_candidates(name, result["feed"], existing_ids, claimed_ids))
+
+    new_articles = locate_candidates(candidates)
+    if new_articles:
+        store.append(new_articles)
+    state.update(validators)
+    existing_ids.update(claimed_ids)
+    return new_articles
+
+
 def run_scraper():
     print(f"=== Running Crime Scraper @ {datetime.utcnow()} ===")
 
-    existing = load_existing()
-    existing_ids = {a["id"] for a in existing}
+    store = open_store()
+    existing_ids = set(store.ids())
 
-    new_articles = []
-    for name, url in RSS_FEEDS.items():
-        new_articles.extend(fetch_feed(name, url, existing_ids))
+    state = load_feed_state()
+    new_articles = ingest_results(download_feeds(RSS_FEEDS, state), store, state, existing_ids)
 
     if new_articles:
-        all_articles = existing + new_articles
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(all_articles, f, ensure_ascii=False, indent=2)
-        print(f"[✓] Added {len(new_articles)} new articles. Total now: {len(all_articles)}")
+        print(f"[✓] Added {len(new_articles)} new articles. Total now: {len(store)}")
     else:
         print("[=] No new articles found.")
+    store.maybe_compact()
+
+    # Only remember validators once the articles they cover are saved
+    save_feed_state(state)
 
 
 if __name__ == "__main__":
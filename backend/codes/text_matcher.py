@@ -0,0 +1,76 @@
+from collections import deque
+
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over many phrases.
+    Finds every occurrence of every phrase in one linear scan of the text,
+    however many phrases there are. Matching is case-insensitive.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._own = [[]]
+        self._outputs = [[]]
+        self._built = False
+
+    def add(self, phrase, value, whole_word=True):
+        """
+        Register a phrase; value is returned for each match.
+        whole_word=False allows the phrase to be followed by more letters
+        (e.g. "kidnap" in "kidnapped"); it must still start a word.
+        """
+        phrase = phrase.casefold()
+        node = 0
+        for char in phrase:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append([])
+            node = nxt
+        self._own[node].append((len(phrase), value, whole_word))
+        self._built = False
+
+    def build(self):
+        """Compute failure links; called automatically before the first scan."""
+        self._outputs = [list(own) for own in self._own]
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+        self._built = True
+
+    def find(self, text):
+        """
+        Yield (start, end, value) for every match, in order of their end.
+        Offsets refer to the case-folded text.
+        """
+        if not self._built:
+            self.build()
+        text = text.casefold()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, value, whole_word in outputs[node]:
+                start = i + 1 - length
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if whole_word and i + 1 < len(text) and text[i + 1].isalnum():
+                    continue
+                yield start, i + 1, value
@@ -0,0 +1,384 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import numpy as np
+
+# Search backends selectable for the legal assistant's retriever
+EXACT = "exact"
+IVF = "ivf"
+HNSW = "hnsw"
+FLOAT16 = "float16"
+INT8 = "int8"
+
+DEFAULT_PARAMS = {
+    # IVF: number of clusters (0 = about sqrt(n)) and clusters scanned per query
+    IVF: {"nlist": 0, "nprobe": 8, "train_iterations": 20},
+    # HNSW: graph degree, build-time and query-time beam width
+    HNSW: {"M": 16, "ef_construction": 200, "ef_search": 64},
+    # Quantized scans: candidates per result rescored with float32 vectors
+    FLOAT16: {"rescore": 4},
+    INT8: {"rescore": 4},
+}
+
+# Rows dequantized at a time when scanning a quantized matrix
+SCAN_BLOCK_ROWS = 8192
+
+
+def top_k(scores, k):
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class BruteForceIndex:
+    """
+    Exact inner-product search over unit-length vectors. Linear in corpus
+    size; kept as the baseline the approximate indexes are checked against.
+    """
+
+    backend = EXACT
+
+    def __init__(self, vectors=None, dim=None):
+        self.vectors = vectors if vectors is not None else np.zeros((0, dim or 0), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def add(self, vectors):
+        self.vectors = np.concatenate([self.vectors, np.asarray(vectors, dtype=np.float32)])
+
+    def search(self, query, k):
+        if not len(self.vectors):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self.vectors @ query
+        ids = top_k(scores, k)
+        return ids, scores[ids]
+
+    def save(self, path):
+        # Nothing to save: the vectors are the persisted embedding matrix
+        os.makedirs(path, exist_ok=True)
+
+    @classmethod
+    def load(cls, path, vectors, params=None):
+        return cls(vectors)
+
+
+class IVFIndex:
+    """
+    Inverted-file index: vectors are clustered with k-means and a query only
+    scores the members of its nprobe closest clusters. Raising nprobe trades
+    latency for recall; nprobe == nlist is exact. Pure numpy, no extra
+    dependency.
+    """
+
+    backend = IVF
+
+    def __init__(self, dim, nlist=0, nprobe=8, train_iterations=20):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.centroids = None
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.lists = []
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def train(self, vectors, seed=0):
+        """Spherical k-means on (a sample of) the vectors."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        nlist = self.nlist or max(1, int(np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(len(vectors), min(len(vectors), nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.train_iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assignment == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1)
+        self.centroids = centroids
+        self.nlist = nlist
+
+    def _rebuild_lists(self):
+        order = np.argsort(self.assignments, kind="stable")
+        bounds = np.searchsorted(self.assignments[order], np.arange(self.nlist + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(self.nlist)]
+
+    def add(self, vectors):
+        """Append vectors; ids continue from the current size."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.centroids is None:
+            self.train(vectors)
+        self.assignments = np.concatenate([self.assignments, np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)])
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self._rebuild_lists()
+
+    def search(self, query, k):
+        if not len(self.vectors):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        probes = top_k(self.centroids @ query, self.nprobe)
+        candidates = np.concatenate([self.lists[c] for c in probes])
+        scores = self.vectors[candidates] @ query
+        best = top_k(scores, k)
+        return candidates[best], scores[best]
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "centroids.npy"), self.centroids)
+        np.save(os.path.join(path, "vectors.npy"), self.vectors)
+        np.save(os.path.join(path, "assignments.npy"), self.assignments)
+
+    @classmethod
+    def load(cls, path, vectors=None, params=None):
+        centroids = np.load(os.path.join(path, "centroids.npy"))
+        params = dict(params or {}, nlist=len(centroids))
+        index = cls(centroids.shape[1], **params)
+        index.centroids = centroids
+        index.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        index.assignments = np.load(os.path.join(path, "assignments.npy"))
+        index._rebuild_lists()
+        return index
+
+
+class HNSWIndex:
+    """
+    Hierarchical navigable small-world graph (hnswlib). Sub-linear search;
+    ef_search trades latency for recall. Requires `pip install hnswlib`.
+    """
+
+    backend = HNSW
+
+    def __init__(self, dim, M=16, ef_construction=200, ef_search=64):
+        import hnswlib
+        self.dim = dim
+        self.ef_search = ef_search
+        self.index = hnswlib.Index(space="ip", dim=dim)
+        self.index.init_index(max_elements=1024, ef_construction=ef_construction, M=M)
+        self.index.set_ef(ef_search)
+
+    def __len__(self):
+        return self.index.get_current_count()
+
+    def add(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        start = len(self)
+        needed = start + len(vectors)
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(max(needed, 2 * self.index.get_max_elements()))
+        self.index.add_items(vectors, np.arange(start, needed))
+
+    def search(self, query, k):
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        self.index.set_ef(max(self.ef_search, k))
+        labels, distances = self.index.knn_query(query, k=k)
+        # hnswlib's inner-product distance is 1 - similarity
+        return labels[0].astype(np.int64), 1 - distances[0]
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.index.save_index(os.path.join(path, "hnsw.bin"))
+
+    @classmethod
+    def load(cls, path, vectors=None, params=None):
+        import hnswlib
+        index = cls.__new__(cls)
+        params = dict(DEFAULT_PARAMS[HNSW], **(params or {}))
+        index.ef_search = params["ef_search"]
+        index.dim = vectors.shape[1]
+        index.index = hnswlib.Index(space="ip", dim=index.dim)
+        index.index.load_index(os.path.join(path, "hnsw.bin"))
+        index.index.set_ef(index.ef_search)
+        return index
+
+
+class QuantizedIndex:
+    """
+    Exact scan over a compressed copy of the vectors (float16, or int8 with
+    a per-dimension scale), rescoring the best k * rescore candidates with
+    the float32 rows. Only the compressed matrix has to stay in memory; the
+    float32 memmap is read for the few rescored rows.
+    """
+
+    backend = None
+    dtype = None
+
+    def __init__(self, dim, rescore=4):
+        self.dim = dim
+        self.rescore = rescore
+        self.codes = np.zeros((0, dim), dtype=self.dtype)
+        self.scale = np.ones(dim, dtype=np.float32)
+        self.full = np.zeros((0, dim), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def quantize(self, vectors):
+        return vectors.astype(self.dtype)
+
+    def add(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.codes = np.concatenate([self.codes, self.quantize(vectors)])
+        # Keep a reference (not a copy) to the first batch, usually the memmap
+        self.full = vectors if not len(self.full) else np.concatenate([self.full, vectors])
+
+    def approximate_scores(self, query):
+        query = (query * self.scale).astype(np.float32)
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), SCAN_BLOCK_ROWS):
+            block = self.codes[start:start + SCAN_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        return scores
+
+    def search(self, query, k):
+        if not len(self.codes):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        candidates = top_k(self.approximate_scores(query), k * max(1, self.rescore))
+        candidates.sort()  # sequential reads from the memmap
+        exact = self.full[candidates] @ query
+        best = top_k(exact, k)
+        return candidates[best], exact[best]
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "codes.npy"), self.codes)
+        np.save(os.path.join(path, "scale.npy"), self.scale)
+
+    @classmethod
+    def load(cls, path, vectors, params=None):
+        index = cls(vectors.shape[1], **dict(DEFAULT_PARAMS[cls.backend], **(params or {})))
+        index.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode="r")
+        index.scale = np.load(os.path.join(path, "scale.npy"))
+        index.full = vectors
+        return index
+
+
+class Float16Index(QuantizedIndex):
+    backend = FLOAT16
+    dtype = np.float16
+
+
+class Int8Index(QuantizedIndex):
+    backend = INT8
+    dtype = np.int8
+
+    def quantize(self, vectors):
+        # One symmetric scale per dimension, fixed by the first batch added
+        if not len(self.codes):
+            peak = np.abs(vectors).max(axis=0)
+            peak[peak == 0] = 1
+            self.scale = (peak / 127).astype(np.float32)
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+
+BACKENDS = {EXACT: BruteForceIndex, IVF: IVFIndex, HNSW: HNSWIndex, FLOAT16: Float16Index, INT8: Int8Index}
+
+
+def build_search_index(backend, vectors, params=None):
+    if backend == EXACT:
+        return BruteForceIndex(vectors)
+    params = dict(DEFAULT_PARAMS[backend], **(params or {}))
+    index = BACKENDS[backend](vectors.shape[1], **params)
+    index.add(vectors)
+    return index
+
+
+def save_search_index(index, path):
+    """Write an index to path in one step: readers see the old one or the whole new one."""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    index.save(tmp_path)
+    open(os.path.join(tmp_path, "done"), "w").close()
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_search_index(path, backend, vectors, params=None):
+    """
+    Load a saved index; vectors are the float32 rows it was built from.
+    Query-time parameters (nprobe, ef_search) are applied on load, so they
+    can be tuned without a rebuild.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown retriever backend {backend!r}; choose from {sorted(BACKENDS)}")
+    if backend == EXACT:
+        return BruteForceIndex(vectors)
+    if not os.path.exists(os.path.join(path, "done")):
+        raise FileNotFoundError(f"No {backend} search index at {path}")
+    return BACKENDS[backend].load(path, vectors, params)
+
+
+class FilteredIndex:
+    """
+    Hides excluded ids (rows of removed documents) from another index's
+    results, fetching more candidates until k survive.
+    """
+
+    def __init__(self, index, excluded):
+        self.index = index
+        self.excluded = frozenset(excluded)
+        self.backend = index.backend
+
+    def __len__(self):
+        return len(self.index) - len(self.excluded)
+
+    def search(self, query, k):
+        if not self.excluded:
+            return self.index.search(query, k)
+        most = min(len(self.index), k + len(self.excluded))
+        fetch = min(most, 2 * k)
+        while True:
+            ids, scores = self.index.search(query, fetch)
+            keep = np.array([i not in self.excluded for i in ids.tolist()], dtype=bool)
+            if keep.sum() >= k or fetch >= most:
+                return ids[keep][:k], scores[keep][:k]
+            fetch = min(most, fetch * 4)
+
+
+def recall_at_k(index, exact, queries, k=5):
+    """Mean fraction of the exact top-k that the index also returns."""
+    hits = 0
+    for query in queries:
+        expected = set(exact.search(query, k)[0].tolist())
+        hits += len(expected & set(index.search(query, k)[0].tolist())) / max(1, len(expected))
+    return hits / max(1, len(queries))
+
+
+def evaluate(index_dir, backend, params=None, k=5, sample=200):
+    """Recall@k and mean latency of a backend against exact search, using stored chunks as queries."""
+    from embedding_index import load_index
+    _, vectors, _ = load_index(index_dir)
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.choice(len(vectors), min(sample, len(vectors)), replace=False)]
+    exact = BruteForceIndex(vectors)
+    index = build_search_index(backend, vectors, params)
+
+    report = {}
+    for name, candidate in (("exact", exact), (backend, index)):
+        started = time.perf_counter()
+        for query in queries:
+            candidate.search(query, k)
+        report[name] = {"ms_per_query": round(1000 * (time.perf_counter() - started) / len(queries), 3)}
+    report[backend][f"recall@{k}"] = round(recall_at_k(index, exact, queries, k), 4)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check an ANN backend's recall and latency against exact search")
+    parser.add_argument("index_dir", help="Embedding index directory (data/index/<fingerprint>)")
+    parser.add_argument("--backend", default=IVF, choices=[IVF, HNSW, FLOAT16, INT8])
+    parser.add_argument("--params", default="{}", help='JSON search params, e.g. \'{"nprobe": 16}\'')
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(evaluate(args.index_dir, args.backend, json.loads(args.params), args.k), indent=2))
@@ -0,0 +1,33 @@
+from PIL import Image
+
+# Images whose hashes differ in at most this many of the 64 bits are treated
+# as the same photo (re-encoded, resized or lightly recompressed)
+NEAR_DUPLICATE_MAX_DISTANCE = 6
+
+
+def perceptual_hash(image_path, hash_size=8):
+    """
+    Difference hash (dHash) of an image file as a 16-char hex string.
+    Robust to resizing, recompression and small brightness changes.
+    """
+    with Image.open(image_path) as image:
+        # Let the JPEG decoder skip most of the work for big photos
+        image.draft('L', (hash_size * 16, hash_size * 16))
+        small = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+        pixels = list(small.getdata())
+
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+def hash_distance(hash_a, hash_b):
+    """Number of differing bits between two hex hashes."""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+
+def is_near_duplicate(hash_a, hash_b, max_distance=NEAR_DUPLICATE_MAX_DISTANCE):
+    return hash_distance(hash_a, hash_b) <= max_distance
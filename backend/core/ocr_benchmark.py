@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+OCR benchmark over a folder of sample ID card images.
+
+For every preprocessing configuration it reports OCR latency, memory and
+keyword-hit accuracy, so verification can be tuned against real samples.
+
+Usage (from the backend directory):
+    python -m core.ocr_benchmark samples/ [--labels samples/labels.json] [--json out.json]
+
+labels.json maps an image file name to the keywords OCR should find, e.g.
+    {"card1.jpg": ["female", "government of india"]}
+Images without a label are expected to contain DEFAULT_KEYWORDS.
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import time
+import tracemalloc
+
+import pytesseract
+
+from core.preprocess_image import preprocess_for_ocr, tesseract_config, load_image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+DEFAULT_KEYWORDS = ["female"]
+
+# Configurations compared by default; "raw" is the pre-preprocessing baseline
+BENCHMARK_CONFIGS = {
+    "raw": {"grayscale": False, "binarize": False, "crop": False, "target_dpi": None, "psm": None},
+    "gray": {"grayscale": True, "binarize": False, "crop": False, "target_dpi": None, "psm": None},
+    "gray_300dpi": {"grayscale": True, "binarize": False, "crop": False, "target_dpi": 300, "psm": None},
+    "binarize_300dpi": {"grayscale": True, "binarize": True, "crop": False, "target_dpi": 300, "psm": None},
+    "crop_binarize_300dpi": {"grayscale": True, "binarize": True, "crop": True, "target_dpi": 300, "psm": None},
+    "full_300dpi_psm6": {"grayscale": True, "binarize": True, "crop": True, "target_dpi": 300, "psm": 6},
+    "full_200dpi_psm6": {"grayscale": True, "binarize": True, "crop": True, "target_dpi": 200, "psm": 6},
+}
+
+
+def list_images(folder):
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def load_labels(path):
+    if not path:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return {name: [kw.lower() for kw in keywords] for name, keywords in json.load(f).items()}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_config(name, config, images, labels, lang="eng"):
+    """OCR every image with one configuration and summarise the results."""
+    latencies = []
+    preprocess_latencies = []
+    peaks = []
+    expected_total = 0
+    hits_total = 0
+    images_all_hit = 0
+
+    for path in images:
+        image = load_image(path)
+        keywords = labels.get(os.path.basename(path), DEFAULT_KEYWORDS)
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        processed = preprocess_for_ocr(image, config)
+        preprocessed = time.perf_counter()
+        text = pytesseract.image_to_string(processed, lang=lang, config=tesseract_config(config))
+        finished = time.perf_counter()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        latencies.append((finished - started) * 1000)
+        preprocess_latencies.append((preprocessed - started) * 1000)
+        peaks.append(peak)
+
+        text_lower = text.lower()
+        hits = sum(1 for kw in keywords if kw in text_lower)
+        expected_total += len(keywords)
+        hits_total += hits
+        if hits == len(keywords):
+            images_all_hit += 1
+
+    return {
+        "config": name,
+        "images": len(images),
+        "mean_ms": round(statistics.mean(latencies), 1),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "preprocess_mean_ms": round(statistics.mean(preprocess_latencies), 1),
+        "peak_python_mb": round(max(peaks) / (1024 * 1024), 2),
+        "keyword_hit_rate": round(hits_total / expected_total, 3) if expected_total else 0.0,
+        "image_accuracy": round(images_all_hit / len(images), 3)
+    }
+
+
+def print_report(results):
+    columns = ["config", "images", "mean_ms", "p50_ms", "p95_ms", "preprocess_mean_ms",
+               "peak_python_mb", "keyword_hit_rate", "image_accuracy"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in results:
+        print("  ".join(str(r[c]).ljust(widths[c]) for c in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR preprocessing configurations")
+    parser.add_argument("folder", help="Folder of sample images")
+    parser.add_argument("--labels", help="JSON file mapping image name to expected keywords")
+    parser.add_argument("--configs", nargs="*", choices=sorted(BENCHMARK_CONFIGS),
+                        help="Configurations to run (default: all)")
+    parser.add_argument("--lang", default="eng", help="Tesseract language")
+    parser.add_argument("--json", dest="json_out", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    images = list_images(args.folder)
+    if not images:
+        parser.error(f"No images found in {args.folder}")
+    labels = load_labels(args.labels)
+
+    results = []
+    for name in args.configs or BENCHMARK_CONFIGS:
+        print(f"Running {name} on {len(images)} images...")
+        results.append(run_config(name, BENCHMARK_CONFIGS[name], images, labels, args.lang))
+
+    print()
+    print_report(results)
+    # ru_maxrss is KB on Linux, bytes on macOS
+    print(f"\nProcess max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss} (platform units)")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
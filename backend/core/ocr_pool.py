@@ -0,0 +1,169 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Server processes on this host, each with its own pool (gunicorn reads
+# the same variable as its default worker count)
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+# One OCR process per core across the host by default; Tesseract is CPU bound
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)))
+# Jobs allowed to wait or run at once before submissions are refused
+OCR_MAX_PENDING = int(os.getenv('OCR_MAX_PENDING', OCR_WORKERS * 4))
+# Workers are started from a fresh server process instead of forked from
+# the threaded web process (Flask, pymongo)
+OCR_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class QueueFullError(Exception):
+    """Raised when the OCR pool has no free slot for another job."""
+
+
+def run_ocr_job(image_path):
+    """
+    Runs inside a worker process: OCR an Aadhar image and check it is female
+    """
+    # Imported here so the web process never loads the OCR stack
+    from core.verify_image import verify_female_in_aadhar_file
+
+    started = time.perf_counter()
+    approved, _ = verify_female_in_aadhar_file(image_path)
+    return {
+        "approved": approved,
+        "ocr_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+
+class OCRWorkerPool:
+    """
+    Process pool for OCR jobs with a bounded number of in-flight jobs.
+    The executor is created on first use so importing this module is cheap,
+    and replaced when a worker dies (OOM, Tesseract crash) breaks it.
+    """
+
+    def __init__(self, max_workers=OCR_WORKERS, max_pending=OCR_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._restarts = 0
+        self._total_ms = 0.0
+        self._ocr_ms = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(OCR_START_METHOD)
+                if OCR_START_METHOD == "forkserver":
+                    # Also hands the server our sys.path so core.* imports resolve
+                    context.set_forkserver_preload(["core.ocr_pool"])
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            return self._executor
+
+    def _reset_executor(self, broken):
+        """Drop a broken executor; the next job starts a fresh one."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+            self._restarts += 1
+        broken.shutdown(wait=False)
+        print("OCR worker died, restarting the OCR pool")
+
+    def _submit_job(self, image_path):
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(run_ocr_job, image_path)
+        except BrokenProcessPool:
+            # Retry once on a fresh pool
+            self._reset_executor(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(run_ocr_job, image_path)
+
+    def is_full(self):
+        with self._lock:
+            return self._in_flight >= self.max_pending
+
+    def submit(self, image_path, on_done):
+        """
+        Queue an OCR job for an image file.
+        on_done(result, error, timing) is called from a pool thread when the
+        job finishes; result is run_ocr_job's dict or None if error is set.
+        Raises QueueFullError instead of queueing without bound.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise QueueFullError(f"OCR queue is full ({self.max_pending} jobs)")
+
+        submitted_at = time.perf_counter()
+        try:
+            executor, future = self._submit_job(image_path)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_flight += 1
+
+        def _done(fut):
+            total_ms = round((time.perf_counter() - submitted_at) * 1000, 1)
+            result, error = None, None
+            try:
+                result = fut.result()
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+                if isinstance(e, BrokenProcessPool):
+                    self._reset_executor(executor)
+            finally:
+                self._slots.release()
+
+            ocr_ms = result["ocr_ms"] if result else 0.0
+            timing = {
+                "total_ms": total_ms,
+                "ocr_ms": ocr_ms,
+                "queue_ms": round(max(total_ms - ocr_ms, 0.0), 1)
+            }
+            with self._lock:
+                self._in_flight -= 1
+                if error:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                    self._ocr_ms += ocr_ms
+                self._total_ms += total_ms
+
+            try:
+                on_done(result, error, timing)
+            except Exception as e:
+                print(f"Error in OCR job callback: {e}")
+
+        future.add_done_callback(_done)
+        return future
+
+    def stats(self):
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "restarts": self._restarts,
+                "avg_total_ms": round(self._total_ms / finished, 1) if finished else 0.0,
+                "avg_ocr_ms": round(self._ocr_ms / self._completed, 1) if self._completed else 0.0
+            }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=wait)
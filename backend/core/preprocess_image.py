@@ -0,0 +1,117 @@
+import cv2
+import numpy as np
+from PIL import Image
+
+# An Aadhar card is 85.6mm (3.37in) wide
+CARD_WIDTH_INCHES = 3.37
+
+# Default preprocessing; every key can be overridden per call
+DEFAULT_PREPROCESS_CONFIG = {
+    "target_dpi": 300,   # downscale so the card is about this many dots per inch
+    "grayscale": True,
+    "binarize": True,    # Otsu threshold after a light blur
+    "crop": True,        # crop to the largest card-shaped contour
+    "psm": 6             # Tesseract page segmentation mode; 6 = single text block
+}
+
+# Longest side of the proxy image used to find the card outline
+CROP_PROXY_SIZE = 800
+# Ignore contours smaller than this fraction of the image
+MIN_CARD_AREA_RATIO = 0.2
+
+
+def resolve_config(config=None):
+    """Merge a partial config with the defaults."""
+    merged = dict(DEFAULT_PREPROCESS_CONFIG)
+    if config:
+        merged.update(config)
+    return merged
+
+
+def tesseract_config(config=None):
+    """Tesseract CLI flags for a preprocessing config."""
+    psm = resolve_config(config).get("psm")
+    return f"--psm {psm}" if psm else ""
+
+
+def to_bgr_array(image):
+    """Convert a PIL image or an OpenCV array to a BGR/gray numpy array."""
+    if isinstance(image, np.ndarray):
+        return image
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    array = np.asarray(image)
+    if array.ndim == 3:
+        array = cv2.cvtColor(array, cv2.COLOR_RGB2BGR)
+    return array
+
+
+def find_card_region(gray):
+    """
+    Find the bounding box (x, y, w, h) of the card in a grayscale image.
+    Works on a downscaled proxy; returns None if no card-like contour is found.
+    """
+    height, width = gray.shape[:2]
+    scale = min(1.0, CROP_PROXY_SIZE / max(height, width))
+    proxy = cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+
+    edges = cv2.Canny(cv2.GaussianBlur(proxy, (5, 5), 0), 50, 150)
+    edges = cv2.dilate(edges, np.ones((3, 3), np.uint8), iterations=2)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+
+    largest = max(contours, key=cv2.contourArea)
+    x, y, w, h = cv2.boundingRect(largest)
+    if w * h < MIN_CARD_AREA_RATIO * proxy.shape[0] * proxy.shape[1]:
+        return None
+    return int(x / scale), int(y / scale), int(w / scale), int(h / scale)
+
+
+def preprocess_for_ocr(image, config=None):
+    """
+    Prepare an ID card photo for OCR: crop to the card, downscale to the
+    target DPI, grayscale and binarize. Accepts a PIL image or numpy array
+    and returns a numpy array that pytesseract accepts directly.
+    """
+    config = resolve_config(config)
+    array = to_bgr_array(image)
+
+    if config["grayscale"] or config["binarize"] or config["crop"]:
+        gray = array if array.ndim == 2 else cv2.cvtColor(array, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = None
+
+    if config["crop"]:
+        region = find_card_region(gray)
+        if region:
+            x, y, w, h = region
+            array = array[y:y + h, x:x + w]
+            gray = gray[y:y + h, x:x + w]
+
+    working = gray if config["grayscale"] or config["binarize"] else array
+
+    target_dpi = config.get("target_dpi")
+    if target_dpi:
+        target_width = int(CARD_WIDTH_INCHES * target_dpi)
+        height, width = working.shape[:2]
+        if width > target_width:
+            scale = target_width / width
+            working = cv2.resize(working, (target_width, int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    if config["binarize"]:
+        working = cv2.GaussianBlur(working, (3, 3), 0)
+        _, working = cv2.threshold(working, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+    if working.ndim == 3:
+        working = cv2.cvtColor(working, cv2.COLOR_BGR2RGB)
+    return working
+
+
+def load_image(path):
+    """Read an image file into a numpy array (BGR), falling back to PIL."""
+    array = cv2.imread(path)
+    if array is None:
+        with Image.open(path) as image:
+            array = to_bgr_array(image)
+    return array
@@ -3,7 +3,21 @@ from PIL import Image
 import cv2
 import base64
 import io
+import os
 import re
+from core.preprocess_image import preprocess_for_ocr, tesseract_config
+
+# Seconds before a single Tesseract run is aborted (0 disables the limit)
+OCR_TIMEOUT_SECONDS = float(os.getenv('OCR_TIMEOUT_SECONDS', 60))
+
+def ocr_image(image, preprocess_config=None):
+    """Preprocess an image and run Tesseract on it."""
+    processed = preprocess_for_ocr(image, preprocess_config)
+    return pytesseract.image_to_string(
+        processed, lang='eng',
+        config=tesseract_config(preprocess_config),
+        timeout=OCR_TIMEOUT_SECONDS
+    )
 
 def extract_text_from_base64(base64_image):
     """Extract text from a base64 encoded image using pytesseract."""
@@ -12,17 +26,19 @@ def extract_text_from_base64(base64_image):
         image_data = base64.b64decode(base64_image.split(',')[1] if ',' in base64_image else base64_image)
         image = Image.open(io.BytesIO(image_data))
         
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # OCR
-        text = pytesseract.image_to_string(image, lang='eng')
+        # Preprocess + OCR
+        text = ocr_image(image)
         return text
     except Exception as e:
         print(f"Error extracting text: {str(e)}")
         return ""
 
+def extract_text_from_file(image_path):
+    """Extract text from an image file using pytesseract."""
+    with Image.open(image_path) as image:
+        # Preprocess + OCR
+        return ocr_image(image)
+
 def verify_female_in_aadhar(base64_image):
     """Verify that the word 'female' is present in the extracted text."""
     try:
@@ -41,6 +57,12 @@ def verify_female_in_aadhar(base64_image):
         print(f"Error during verification: {str(e)}")
         return False, str(e)
 
+def verify_female_in_aadhar_file(image_path):
+    """Verify that the word 'female' is present in an Aadhar image file.
+    Unlike verify_female_in_aadhar, OCR errors are raised to the caller."""
+    extracted_text = extract_text_from_file(image_path)
+    return "female" in extracted_text.lower(), extracted_text
+
 # Example usage
 if __name__ == "__main__":
     # This section is for testing purposes
@@ -1,13 +1,12 @@
 import pytesseract
-from PIL import Image
-import cv2
+from core.preprocess_image import preprocess_for_ocr, tesseract_config, load_image
 
-def extract_text(img_path, lang="eng"):
+def extract_text(img_path, lang="eng", preprocess_config=None):
     """Extract text from an image using pytesseract."""
-    # Open image
-    img = Image.open(img_path)
+    # Open and preprocess image
+    img = preprocess_for_ocr(load_image(img_path), preprocess_config)
     # OCR
-    text = pytesseract.image_to_string(img, lang=lang)
+    text = pytesseract.image_to_string(img, lang=lang, config=tesseract_config(preprocess_config))
     return text
 
 # Example usage
@@ -0,0 +1,138 @@
+import hashlib
+import io
+import os
+import tempfile
+from .init import db
+
+# Where blobs live: "local" (content-addressed directory) or "gridfs"
+BLOB_STORE_BACKEND = os.getenv('BLOB_STORE_BACKEND', 'local')
+BLOB_STORE_DIR = os.getenv('BLOB_STORE_DIR', os.path.join(os.path.dirname(__file__), '..', 'data', 'blobs'))
+GRIDFS_BUCKET_NAME = os.getenv('BLOB_STORE_GRIDFS_BUCKET', 'blobs')
+
+CHUNK_SIZE = 64 * 1024
+
+_gridfs_bucket = None
+
+def _get_gridfs_bucket():
+    global _gridfs_bucket
+    if _gridfs_bucket is None:
+        import gridfs
+        _gridfs_bucket = gridfs.GridFSBucket(db, bucket_name=GRIDFS_BUCKET_NAME)
+    return _gridfs_bucket
+
+def blob_path(digest):
+    """
+    Path of a blob in the local backend, sharded by the first hash bytes
+    """
+    return os.path.join(BLOB_STORE_DIR, digest[:2], digest[2:4], digest)
+
+def _spool(stream):
+    """
+    Copy a stream to a temp file chunk by chunk while hashing it
+    Returns (temp_path, sha256 hex digest, size in bytes)
+    """
+    tmp_dir = os.path.join(BLOB_STORE_DIR, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    sha256 = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, sha256.hexdigest(), size
+
+def blob_exists(digest):
+    """
+    Check whether a blob with this sha256 digest is stored
+    """
+    if BLOB_STORE_BACKEND == 'gridfs':
+        return db[f"{GRIDFS_BUCKET_NAME}.files"].find_one({"filename": digest}, {"_id": 1}) is not None
+    return os.path.exists(blob_path(digest))
+
+def save_blob(stream, content_type=None):
+    """
+    Store a readable binary stream without holding it in memory.
+    Identical content is stored once.
+
+    Returns:
+        dict: {"sha256": digest, "size": bytes, "backend": backend name}
+    """
+    tmp_path, digest, size = _spool(stream)
+    try:
+        if not blob_exists(digest):
+            if BLOB_STORE_BACKEND == 'gridfs':
+                with open(tmp_path, 'rb') as f:
+                    _get_gridfs_bucket().upload_from_stream(
+                        digest, f, chunk_size_bytes=CHUNK_SIZE,
+                        metadata={"content_type": content_type, "size": size}
+                    )
+            else:
+                path = blob_path(digest)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return {"sha256": digest, "size": size, "backend": BLOB_STORE_BACKEND}
+
+def save_bytes(data, content_type=None):
+    """
+    Store an in-memory payload, e.g. a decoded base64 image
+    """
+    return save_blob(io.BytesIO(data), content_type)
+
+def iter_blob(digest, chunk_size=CHUNK_SIZE):
+    """
+    Yield a stored blob chunk by chunk
+    Raises FileNotFoundError if the blob does not exist
+    """
+    if BLOB_STORE_BACKEND == 'gridfs':
+        import gridfs
+        try:
+            grid_out = _get_gridfs_bucket().open_download_stream_by_name(digest)
+        except gridfs.errors.NoFile:
+            raise FileNotFoundError(digest)
+        with grid_out:
+            while True:
+                chunk = grid_out.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        return
+
+    with open(blob_path(digest), 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+def materialize_blob(digest):
+    """
+    Get a filesystem path for a blob, e.g. to hand it to another process
+    Returns (path, is_temp); delete the path when is_temp is True
+    """
+    if BLOB_STORE_BACKEND != 'gridfs':
+        return blob_path(digest), False
+    
+    tmp_dir = os.path.join(BLOB_STORE_DIR, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter_blob(digest):
+                f.write(chunk)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, True
@@ -1,29 +1,144 @@
 import datetime
+import re
 from flask import jsonify, request
+from pymongo import ReturnDocument
 from .init import customer_records
+from .user_cache import get_user, invalidate_user
 from bson import ObjectId
 
+CONTACT_FIELDS = ['name', 'phone', 'relation']
+
+# Upper bound on contacts accepted by a single sync request
+MAX_SYNC_CONTACTS = 50
+# Times a sync is recomputed when the contacts changed while it was planned
+SYNC_ATTEMPTS = 3
+DEFAULT_COUNTRY_CODE = "91"
+
+NON_DIGIT_PATTERN = re.compile(r'\D')
+
+def normalize_phone_numbers(phones):
+    """
+    Normalize a batch of phone numbers to E.164 in one pass, e.g.
+    "098765 43210", "+91-98765-43210" and "9876543210" all become
+    "+919876543210". Numbers with an explicit foreign code are kept as is,
+    and short local numbers such as helplines ("112", "1091") keep their
+    digits without a "+" so they still dial.
+    """
+    normalized = []
+    for phone in phones:
+        raw = str(phone or '').strip()
+        digits = NON_DIGIT_PATTERN.sub('', raw)
+        if raw.startswith('+'):
+            pass
+        elif raw.startswith('00'):
+            digits = digits[2:]
+        elif raw.startswith('0') and len(digits) == 11:
+            digits = DEFAULT_COUNTRY_CODE + digits[1:]
+        elif len(digits) == 10:
+            digits = DEFAULT_COUNTRY_CODE + digits
+        elif len(digits) < 10:
+            normalized.append(digits)
+            continue
+        normalized.append(f"+{digits}" if digits else '')
+    return normalized
+
+def new_contact(data):
+    """
+    Build a trusted contact sub-document with a stable id
+    """
+    return {
+        "id": str(ObjectId()),
+        "name": data['name'],
+        "phone": data['phone'],
+        "relation": data['relation'],
+        "created_at": datetime.datetime.utcnow()
+    }
+
+def contact_payload():
+    """
+    Contact fields from the request body; accepts both {"name": ...} and
+    {"contact": {"name": ...}} as sent by the mobile app
+    """
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and isinstance(data.get('contact'), dict):
+        return data['contact']
+    return data
+
+def contact_index(contact_id):
+    """
+    Legacy routes address contacts by list position; returns the index for
+    numeric references and None for contact ids
+    """
+    if isinstance(contact_id, int):
+        return contact_id
+    if contact_id.isdigit() and len(contact_id) < 24:
+        return int(contact_id)
+    return None
+
+def user_contacts(user):
+    """
+    Trusted contacts of a user document; users created before the
+    trusted_contacts array fall back to their single emergency_contact
+    """
+    if 'trusted_contacts' in user:
+        return user['trusted_contacts']
+    emergency_contact = user.get('emergency_contact')
+    return [emergency_contact] if emergency_contact else []
+
+def legacy_contacts_expression():
+    """
+    Aggregation expression that yields the existing trusted_contacts array,
+    or the legacy emergency_contact wrapped in a list (its id is the user id)
+    """
+    return {
+        "$ifNull": [
+            "$trusted_contacts",
+            {
+                "$cond": [
+                    {"$gt": ["$emergency_contact", None]},
+                    [{"$mergeObjects": ["$emergency_contact", {"id": {"$toString": "$_id"}}]}],
+                    []
+                ]
+            }
+        ]
+    }
+
+def migrate_user_contacts(user_id):
+    """
+    Give one legacy user a trusted_contacts array holding their
+    emergency_contact (same conversion as the add route); returns True if
+    the user needed it
+    """
+    result = customer_records.update_one(
+        {"_id": ObjectId(user_id), "trusted_contacts": {"$exists": False}},
+        [{"$set": {"trusted_contacts": legacy_contacts_expression()}}]
+    )
+    if result.modified_count:
+        invalidate_user(user_id)
+    return result.modified_count > 0
+
 def get_trusted_contacts(user_id):
     """
     Get trusted contacts for a user
     """
     try:
         # Validate user exists
-        user = customer_records.find_one({"_id": ObjectId(user_id)})
+        user = get_user(user_id, fresh=True)
         if not user:
             return jsonify({
                 "success": False,
                 "message": "User not found"
             }), 404
-            
-        # Return user's emergency contact
-        emergency_contact = user.get('emergency_contact', {})
+        
+        # Legacy users get their array (and contact ids) on first read
+        if 'trusted_contacts' not in user and user.get('emergency_contact') and migrate_user_contacts(user_id):
+            user = get_user(user_id, fresh=True)
         
         return jsonify({
             "success": True,
-            "contacts": [emergency_contact] if emergency_contact else []
+            "contacts": user_contacts(user)
         }), 200
-            
+    
     except Exception as e:
         return jsonify({
             "success": False,
@@ -42,7 +157,7 @@ def add_trusted_contact(user_id):
     """
     try:
         # Get JSON data from request
-        data = request.get_json()
+        data = contact_payload()
         
         # Validate input
         if not data:
@@ -50,52 +165,56 @@ def add_trusted_contact(user_id):
                 "success": False,
                 "message": "Contact data is required"
             }), 400
-            
-        required_fields = ['name', 'phone', 'relation']
-        for field in required_fields:
+        
+        for field in CONTACT_FIELDS:
             if not data.get(field):
                 return jsonify({
                     "success": False,
                     "message": f"Contact {field} is required"
                 }), 400
         
-        # Validate user exists
-        user = customer_records.find_one({"_id": ObjectId(user_id)})
-        if not user:
-            return jsonify({
-                "success": False,
-                "message": "User not found"
-            }), 404
-            
-        # Update user's emergency contact
-        customer_records.update_one(
+        contact = new_contact(data)
+        
+        # Append in one atomic update; a legacy emergency_contact is folded
+        # into the array the first time. $literal keeps user input from being
+        # read as field paths.
+        result = customer_records.update_one(
             {"_id": ObjectId(user_id)},
-            {
+            [{
                 "$set": {
-                    "emergency_contact": {
-                        "name": data['name'],
-                        "phone": data['phone'],
-                        "relation": data['relation']
+                    "trusted_contacts": {
+                        "$concatArrays": [
+                            legacy_contacts_expression(),
+                            [{"$literal": contact}]
+                        ]
                     },
-                    "updated_at": datetime.datetime.utcnow()
+                    "updated_at": "$$NOW"
                 }
-            }
+            }]
         )
+        if result.matched_count == 0:
+            return jsonify({
+                "success": False,
+                "message": "User not found"
+            }), 404
+        invalidate_user(user_id)
         
         return jsonify({
             "success": True,
-            "message": "Trusted contact added successfully"
+            "message": "Trusted contact added successfully",
+            "contact": contact
         }), 200
-            
+    
     except Exception as e:
         return jsonify({
             "success": False,
             "message": f"Error adding contact: {str(e)}"
         }), 500
 
-def update_trusted_contact(user_id, contact_index):
+def update_trusted_contact(user_id, contact_id):
     """
     Update a trusted contact for a user
+    contact_id is the contact's id (or its list position for older clients)
     Expected JSON input:
     {
         "name": "Contact Name",
@@ -105,7 +224,7 @@ def update_trusted_contact(user_id, contact_index):
     """
     try:
         # Get JSON data from request
-        data = request.get_json()
+        data = contact_payload()
         
         # Validate input
         if not data:
@@ -113,74 +232,253 @@ def update_trusted_contact(user_id, contact_index):
                 "success": False,
                 "message": "Contact data is required"
             }), 400
-            
-        # Validate user exists
-        user = customer_records.find_one({"_id": ObjectId(user_id)})
+        
+        updates = {field: data[field] for field in CONTACT_FIELDS if data.get(field)}
+        if not updates:
+            return jsonify({
+                "success": False,
+                "message": "Contact data is required"
+            }), 400
+        
+        # Positional update filtered on the user, in one round trip
+        index = contact_index(contact_id)
+        if index is None:
+            query = {"_id": ObjectId(user_id), "trusted_contacts.id": contact_id}
+            prefix = "trusted_contacts.$"
+        else:
+            query = {"_id": ObjectId(user_id), f"trusted_contacts.{index}": {"$exists": True}}
+            prefix = f"trusted_contacts.{index}"
+        
+        for attempt in range(2):
+            user = customer_records.find_one_and_update(
+                query,
+                {
+                    "$set": {
+                        **{f"{prefix}.{field}": value for field, value in updates.items()},
+                        "updated_at": datetime.datetime.utcnow()
+                    }
+                },
+                projection={"trusted_contacts": 1},
+                return_document=ReturnDocument.AFTER
+            )
+            # A legacy user has no array yet: create it and try once more
+            if user or attempt or not migrate_user_contacts(user_id):
+                break
         if not user:
             return jsonify({
                 "success": False,
-                "message": "User not found"
+                "message": "Contact not found"
             }), 404
-            
-        # Update user's emergency contact
-        customer_records.update_one(
-            {"_id": ObjectId(user_id)},
-            {
-                "$set": {
-                    "emergency_contact": {
-                        "name": data.get('name', user.get('emergency_contact', {}).get('name', '')),
-                        "phone": data.get('phone', user.get('emergency_contact', {}).get('phone', '')),
-                        "relation": data.get('relation', user.get('emergency_contact', {}).get('relation', ''))
-                    },
-                    "updated_at": datetime.datetime.utcnow()
-                }
-            }
-        )
+        invalidate_user(user_id)
+        
+        if index is None:
+            contact = next((c for c in user['trusted_contacts'] if c.get('id') == contact_id), None)
+        else:
+            contact = user['trusted_contacts'][index]
         
         return jsonify({
             "success": True,
-            "message": "Trusted contact updated successfully"
+            "message": "Trusted contact updated successfully",
+            "contact": contact
         }), 200
-            
+    
     except Exception as e:
         return jsonify({
             "success": False,
             "message": f"Error updating contact: {str(e)}"
         }), 500
 
-def delete_trusted_contact(user_id, contact_index):
+def delete_trusted_contact(user_id, contact_id):
     """
     Delete a trusted contact for a user
+    contact_id is the contact's id (or its list position for older clients)
     """
     try:
-        # Validate user exists
-        user = customer_records.find_one({"_id": ObjectId(user_id)})
-        if not user:
+        index = contact_index(contact_id)
+        for attempt in range(2):
+            if index is None:
+                result = customer_records.update_one(
+                    {"_id": ObjectId(user_id), "trusted_contacts.id": contact_id},
+                    {
+                        "$pull": {"trusted_contacts": {"id": contact_id}},
+                        "$set": {"updated_at": datetime.datetime.utcnow()}
+                    }
+                )
+            else:
+                # Remove by position without reading the array first
+                result = customer_records.update_one(
+                    {"_id": ObjectId(user_id), f"trusted_contacts.{index}": {"$exists": True}},
+                    [{
+                        "$set": {
+                            "trusted_contacts": {
+                                "$concatArrays": [
+                                    {"$slice": ["$trusted_contacts", index]},
+                                    {"$slice": ["$trusted_contacts", index + 1, {"$size": "$trusted_contacts"}]}
+                                ]
+                            },
+                            "updated_at": "$$NOW"
+                        }
+                    }]
+                )
+            # A legacy user has no array yet: create it and try once more
+            if result.matched_count or attempt or not migrate_user_contacts(user_id):
+                break
+        
+        if result.matched_count == 0:
             return jsonify({
                 "success": False,
-                "message": "User not found"
+                "message": "Contact not found"
             }), 404
-            
-        # Remove user's emergency contact
-        customer_records.update_one(
-            {"_id": ObjectId(user_id)},
-            {
-                "$unset": {
-                    "emergency_contact": ""
-                },
-                "$set": {
-                    "updated_at": datetime.datetime.utcnow()
-                }
-            }
-        )
+        invalidate_user(user_id)
         
         return jsonify({
             "success": True,
             "message": "Trusted contact deleted successfully"
         }), 200
-            
+    
     except Exception as e:
         return jsonify({
             "success": False,
             "message": f"Error deleting contact: {str(e)}"
-        }), 500
\ No newline at end of file
+        }), 500
+
+def plan_sync(stored, desired):
+    """
+    Match the desired contacts against the stored ones by id, then by
+    normalized phone; returns (contacts in request order, added, updated, removed ids)
+    """
+    # Normalize stored and desired numbers together so they compare equal
+    phones = normalize_phone_numbers(
+        [c.get('phone') for c in stored] + [c['phone'] for c in desired]
+    )
+    stored_phones, desired_phones = phones[:len(stored)], phones[len(stored):]
+    
+    stored_by_id = {c.get('id'): c for c in stored if c.get('id')}
+    stored_by_phone = {phone: c for phone, c in zip(stored_phones, stored) if phone}
+    
+    result_contacts = []
+    kept_ids = set()
+    added = []
+    updated = 0
+    for contact, phone in zip(desired, desired_phones):
+        wanted = {
+            "name": contact['name'],
+            "phone": phone,
+            "relation": contact.get('relation') or "Contact"
+        }
+        match = stored_by_id.get(contact.get('id')) or stored_by_phone.get(phone)
+        if match and match.get('id') not in kept_ids:
+            kept_ids.add(match['id'])
+            if any(match.get(field) != value for field, value in wanted.items()):
+                updated += 1
+            result_contacts.append({**match, **wanted})
+        elif phone not in {c['phone'] for c in result_contacts}:
+            new = new_contact(wanted)
+            added.append(new)
+            result_contacts.append(new)
+    
+    removed_ids = [c['id'] for c in stored if c.get('id') not in kept_ids and c.get('id')]
+    return result_contacts, added, updated, removed_ids
+
+def sync_trusted_contacts(user_id):
+    """
+    Replace a user's trusted contacts with the desired set, e.g. when
+    importing from the phone book. Contacts are matched by id, then by
+    normalized phone, and stored in request order. The new list is written
+    in one update that only applies if the list is still the one it was
+    computed from; otherwise the sync is recomputed.
+    Expected JSON input:
+    {
+        "contacts": [
+            {"id": "optional_existing_id", "name": "Contact Name", "phone": "+1234567890", "relation": "Parent/Friend/etc"}
+        ]
+    }
+    """
+    try:
+        # Get JSON data from request
+        data = request.get_json(silent=True)
+        
+        # Validate input
+        if not isinstance(data, dict) or not isinstance(data.get('contacts'), list):
+            return jsonify({
+                "success": False,
+                "message": "A contacts list is required"
+            }), 400
+        
+        desired = data['contacts']
+        if len(desired) > MAX_SYNC_CONTACTS:
+            return jsonify({
+                "success": False,
+                "message": f"At most {MAX_SYNC_CONTACTS} contacts can be synced at once"
+            }), 400
+        
+        for position, contact in enumerate(desired):
+            if not isinstance(contact, dict) or not contact.get('name') or not contact.get('phone'):
+                return jsonify({
+                    "success": False,
+                    "message": f"Contact {position} needs a name and phone"
+                }), 400
+        
+        # Legacy users keep their emergency contact as a matchable entry
+        migrate_user_contacts(user_id)
+        
+        for _ in range(SYNC_ATTEMPTS):
+            user = customer_records.find_one({"_id": ObjectId(user_id)}, {"trusted_contacts": 1})
+            if not user:
+                return jsonify({
+                    "success": False,
+                    "message": "User not found"
+                }), 404
+            stored = user.get('trusted_contacts', [])
+            
+            result_contacts, added, updated, removed_ids = plan_sync(stored, desired)
+            
+            # The whole list in one write, filtered on the list it was planned
+            # from, so a concurrent add or sync is never overwritten
+            result = customer_records.update_one(
+                {"_id": ObjectId(user_id), "trusted_contacts": stored},
+                {
+                    "$set": {
+                        "trusted_contacts": result_contacts,
+                        "updated_at": datetime.datetime.utcnow()
+                    }
+                }
+            )
+            if result.matched_count:
+                break
+        else:
+            return jsonify({
+                "success": False,
+                "message": "Contacts changed during the sync, please try again"
+            }), 409
+        invalidate_user(user_id)
+        
+        return jsonify({
+            "success": True,
+            "message": "Trusted contacts synced successfully",
+            "added": len(added),
+            "updated": updated,
+            "removed": len(removed_ids),
+            "contacts": result_contacts
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error syncing contacts: {str(e)}"
+        }), 500
+
+def migrate_emergency_contacts():
+    """
+    Copy every legacy emergency_contact into a trusted_contacts array with a
+    stable id, so positional updates work for older accounts too
+    """
+    result = customer_records.update_many(
+        {"emergency_contact": {"$exists": True}, "trusted_contacts": {"$exists": False}},
+        [{"$set": {"trusted_contacts": legacy_contacts_expression()}}]
+    )
+    return result.modified_count
+
+if __name__ == "__main__":
+    # Run from the backend directory: python -m db.contacts
+    print(f"Migrated {migrate_emergency_contacts()} users to trusted_contacts")
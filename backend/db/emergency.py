@@ -6,8 +6,8 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services'))
 
 from flask import jsonify, request
-from .init import customer_records
-from bson import ObjectId
+from .user_cache import get_user
+from .contacts import user_contacts
 from sos import send_sms
 
 # Import geopy for reverse geocoding
@@ -84,10 +84,11 @@ def send_sos():
         user_phone = "Unknown Phone"
         if data.get('user_id'):
             try:
-                user = customer_records.find_one({"_id": ObjectId(data['user_id'])})
+                user = get_user(data['user_id'], fresh=True)
                 if user:
                     user_name = user.get('name', 'Unknown User')
-                    user_phone = user.get('phone', user.get('emergency_contact', {}).get('phone', 'Unknown Phone'))
+                    contacts = user_contacts(user)
+                    user_phone = user.get('phone', contacts[0].get('phone', 'Unknown Phone') if contacts else 'Unknown Phone')
             except Exception:
                 # Invalid user ID format, continue with default values
                 pass
@@ -151,8 +152,8 @@ def send_location_to_contacts():
         user_id = data['user_id']
         location = data['location']
         
-        # Validate user exists
-        user = customer_records.find_one({"_id": ObjectId(user_id)})
+        # Validate user exists; contacts are read fresh, never from the cache
+        user = get_user(user_id, fresh=True)
         if not user:
             return jsonify({
                 "success": False,
@@ -167,7 +168,7 @@ def send_location_to_contacts():
         return jsonify({
             "success": True,
             "message": "Location shared with emergency contacts",
-            "contacts_notified": user.get('emergency_contact', {})
+            "contacts_notified": user_contacts(user)
         }), 200
             
     except Exception as e:
@@ -1,23 +1,58 @@
-import json
 import os
+import sys
+import threading
 from flask import jsonify
 from .init import poll_records, news_records
 from datetime import datetime, timedelta
 
-# Path to the geocoded crime locations file
-CRIME_DATA_FILE = os.path.join(os.path.dirname(__file__), '..', 'codes', 'crime_locations_geocoded.json')
+# Add the codes directory to the path so we can import the JSONL store
+codes_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'codes')
+sys.path.append(codes_dir)
+from jsonl_store import JsonlStore, default_key
+
+# Path to the geocoded crime locations store; the geocoder writes it (and
+# imports the legacy JSON), the web app only reads it
+CRIME_DATA_FILE = os.path.join(codes_dir, 'crime_locations_geocoded.jsonl')
+LEGACY_CRIME_DATA_FILE = os.path.join(codes_dir, 'crime_locations_geocoded.json')
+
+# Crime points kept in memory; each request only reads what the geocoder
+# appended since the previous one
+crime_store = JsonlStore(CRIME_DATA_FILE, legacy_json_path=LEGACY_CRIME_DATA_FILE, read_only=True)
+crime_points = {}
+crime_watermark = None
+crime_lock = threading.Lock()
+
+def load_crime_points():
+    """
+    Get heatmap points for geocoded crimes, reading the store incrementally
+    """
+    global crime_watermark
+    with crime_lock:
+        changes, watermark, reset = crime_store.read_since(crime_watermark)
+        if reset:
+            crime_points.clear()
+        for offset, crime in changes:
+            key = default_key(crime) or offset
+            if crime.get('latitude') and crime.get('longitude'):
+                # Higher weight for crimes (more dangerous)
+                crime_points[key] = {
+                    'latitude': crime['latitude'],
+                    'longitude': crime['longitude'],
+                    'weight': 0.8,  # High weight for actual crimes
+                    'type': 'crime',
+                    'location': crime.get('location_string', ''),
+                    'timestamp': crime.get('timestamp', '')
+                }
+            else:
+                crime_points.pop(key, None)
+        crime_watermark = watermark
+        return list(crime_points.values())
 
 def get_heatmap_data():
     """
     Get heatmap data combining crime data, news, and user polls
     """
     try:
-        # Load crime data
-        crime_data = []
-        if os.path.exists(CRIME_DATA_FILE):
-            with open(CRIME_DATA_FILE, 'r') as f:
-                crime_data = json.load(f)
-        
         # Get recent poll data (last 30 days)
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
         poll_data = list(poll_records.find({
@@ -29,21 +64,8 @@ def get_heatmap_data():
             "created_at": {"$gte": thirty_days_ago}
         }))
         
-        # Process data for heatmap
-        heatmap_points = []
-        
-        # Add crime data points
-        for crime in crime_data:
-            if crime.get('latitude') and crime.get('longitude'):
-                # Higher weight for crimes (more dangerous)
-                heatmap_points.append({
-                    'latitude': crime['latitude'],
-                    'longitude': crime['longitude'],
-                    'weight': 0.8,  # High weight for actual crimes
-                    'type': 'crime',
-                    'location': crime.get('location_string', ''),
-                    'timestamp': crime.get('timestamp', '')
-                })
+        # Process data for heatmap, starting with crime data points
+        heatmap_points = load_crime_points()
         
         # Add poll data points
         for poll in poll_data:
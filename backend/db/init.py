@@ -1,9 +1,16 @@
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
+from pymongo import ASCENDING, DESCENDING
 import os
+import sys
 from dotenv import load_dotenv
 import urllib.parse
 
+# Add the codes directory to the path so we can import the lazy loader
+codes_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'codes')
+sys.path.append(codes_dir)
+from lazy import LazyResource, READY
+
 # Load environment variables
 load_dotenv()
 
@@ -21,7 +28,7 @@ if not all([username, password, cluster, database_name]):
 encoded_password = urllib.parse.quote_plus(password)
 uri = f"mongodb+srv://{username}:{encoded_password}@{cluster}/?retryWrites=true&w=majority&appName=Cluster0"
 
-# Create MongoDB client
+# Create MongoDB client (connects in the background, never blocks here)
 client = MongoClient(uri, server_api=ServerApi('1'), connectTimeoutMS=5000, serverSelectionTimeoutMS=5000)
 # Get database
 db = client.get_database(database_name)
@@ -34,7 +41,52 @@ poll_records = db.poll
 news_records = db.news
 verification_records = db.verification  # New collection for image verification
 
-print("MongoDB connection established successfully!")
+def ensure_indexes():
+    """
+    Create the indexes the request handlers rely on, each on its own so one
+    failure does not hold back the rest. Raises with every failure, e.g.
+    the unique indexes cannot be built while duplicate users exist.
+    Unique indexes on email and Aadhar number let registration do a single
+    insert and turn duplicate sign-ups into a DuplicateKeyError.
+    """
+    indexes = [
+        (customer_records, [("email", ASCENDING)], {"unique": True, "name": "email_unique"}),
+        (customer_records, [("aadhar_number", ASCENDING)], {"unique": True, "name": "aadhar_number_unique"}),
+        (verification_records, [("user_id", ASCENDING), ("created_at", DESCENDING)], {}),
+        (verification_records, [("user_id", ASCENDING), ("image_sha256", ASCENDING)], {}),
+        (verification_records, [("user_id", ASCENDING), ("image_phash", ASCENDING)], {"sparse": True}),
+        (verification_records, [("status", ASCENDING), ("heartbeat_at", ASCENDING)], {})
+    ]
+    errors = []
+    for collection, keys, options in indexes:
+        try:
+            collection.create_index(keys, **options)
+        except Exception as e:
+            errors.append(f"{collection.name} {options.get('name') or keys}: {e}")
+    if errors:
+        raise RuntimeError("; ".join(errors))
+    return True
+
+# Reported on its own by /api/health and not retried: a failed build needs
+# someone to remove the duplicates first
+indexes_ready = LazyResource("mongodb_indexes", ensure_indexes)
+
+def unique_indexes_ready():
+    """Whether the database itself rejects duplicate emails and Aadhar numbers"""
+    return indexes_ready.state == READY
+
+def connect_database():
+    """
+    Ping the deployment, then build the indexes in the background. Runs
+    once, on a background thread at app startup, so importing this module
+    stays instant. An index failure does not fail the connection.
+    """
+    client.admin.command('ping')
+    print("Pinged your deployment. You successfully connected to MongoDB!")
+    indexes_ready.warm_up()
+    return client
+
+database_ready = LazyResource("mongodb", connect_database)
 
 # Test connection
 def test_connection():
@@ -1,9 +1,27 @@
 import datetime
 from flask import jsonify, request
 import bcrypt
-from .init import customer_records
+from .init import customer_records, unique_indexes_ready
+from .user_cache import invalidate_user
+from .contacts import new_contact
 import re
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+def duplicate_user_response(error):
+    """
+    Map a DuplicateKeyError from the customer unique indexes to a 409 response
+    """
+    details = error.details or {}
+    duplicate_fields = set(details.get('keyPattern', {})) | set(details.get('keyValue', {}))
+    if 'aadhar_number' in duplicate_fields or 'aadhar_number' in str(error):
+        message = "User with this Aadhar number already exists"
+    else:
+        message = "User with this email already exists"
+    return jsonify({
+        "success": False,
+        "message": message
+    }), 409
 
 def register_user():
     """
@@ -66,19 +84,6 @@ def register_user():
                     "message": f"Emergency contact {field} is required"
                 }), 400
         
-        # Check if user already exists
-        if customer_records.find_one({"email": data['email']}):
-            return jsonify({
-                "success": False,
-                "message": "User with this email already exists"
-            }), 409
-            
-        if customer_records.find_one({"aadhar_number": aadhar}):
-            return jsonify({
-                "success": False,
-                "message": "User with this Aadhar number already exists"
-            }), 409
-        
         # Hash password
         hashed_password = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt())
         
@@ -93,15 +98,36 @@ def register_user():
                 "phone": emergency_contact['phone'],
                 "relation": emergency_contact['relation']
             },
+            "trusted_contacts": [new_contact(emergency_contact)],
             "is_verified": False,
             "created_at": datetime.datetime.utcnow(),
             "updated_at": datetime.datetime.utcnow()
         }
         
-        # Insert user into database
-        result = customer_records.insert_one(user_data)
+        # Without the unique indexes (still building, or blocked by existing
+        # duplicates) nothing else stops a duplicate, so check first
+        if not unique_indexes_ready():
+            existing = customer_records.find_one(
+                {"$or": [{"email": data['email']}, {"aadhar_number": aadhar}]},
+                {"email": 1}
+            )
+            if existing:
+                return jsonify({
+                    "success": False,
+                    "message": "User with this email already exists" if existing.get('email') == data['email']
+                    else "User with this Aadhar number already exists"
+                }), 409
+        
+        # Insert user into database; the unique indexes on email and
+        # aadhar_number reject duplicates in the same round trip
+        try:
+            result = customer_records.insert_one(user_data)
+        except DuplicateKeyError as e:
+            return duplicate_user_response(e)
         
         if result.inserted_id:
+            invalidate_user(result.inserted_id)
+            
             # Remove password from response
             user_response = {key: value for key, value in user_data.items() if key != 'password'}
             user_response['_id'] = str(result.inserted_id)
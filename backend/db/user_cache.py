@@ -0,0 +1,64 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from bson import ObjectId
+from .init import customer_records
+
+# Size and freshness of the in-process user profile cache
+USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', 1024))
+USER_CACHE_TTL_SECONDS = float(os.getenv('USER_CACHE_TTL_SECONDS', 60))
+
+# Never cache the password hash
+USER_PROFILE_PROJECTION = {"password": 0}
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+def get_user(user_id, fresh=False):
+    """
+    Get a user profile by id, served from memory when it is hot.
+    The cache is per process, so invalidate_user() only clears the worker
+    that made the write; pass fresh=True to read the database (and refresh
+    the cache) where a stale profile is not acceptable, e.g. the trusted
+    contacts shown to the user or used in an emergency.
+    Returns None if the user does not exist. Raises bson.errors.InvalidId
+    for malformed ids, same as ObjectId(user_id).
+    """
+    object_id = ObjectId(user_id)
+    key = str(object_id)
+    now = time.monotonic()
+
+    with _lock:
+        entry = _cache.get(key)
+        if entry:
+            expires_at, user = entry
+            if expires_at > now and not fresh:
+                _cache.move_to_end(key)
+                return copy.deepcopy(user)
+            del _cache[key]
+
+    user = customer_records.find_one({"_id": object_id}, USER_PROFILE_PROJECTION)
+    if user:
+        with _lock:
+            _cache[key] = (now + USER_CACHE_TTL_SECONDS, user)
+            _cache.move_to_end(key)
+            while len(_cache) > USER_CACHE_MAX_ENTRIES:
+                _cache.popitem(last=False)
+        return copy.deepcopy(user)
+    return None
+
+def invalidate_user(user_id):
+    """
+    Drop a user from the cache; call after every write to the user document
+    """
+    with _lock:
+        _cache.pop(str(user_id), None)
+
+def clear_user_cache():
+    """
+    Drop every cached user profile
+    """
+    with _lock:
+        _cache.clear()
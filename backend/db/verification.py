@@ -1,67 +1,292 @@
-from flask import jsonify, request
-from .init import verification_records, customer_records
+from flask import jsonify, request, Response, stream_with_context
+from .init import verification_records, customer_records, database_ready
+from .user_cache import get_user, invalidate_user
+from .lgin import verify_token
+from .blob_store import save_blob, save_bytes, blob_exists, iter_blob, materialize_blob
+from core.ocr_pool import OCRWorkerPool, QueueFullError
+from core.image_hash import perceptual_hash, is_near_duplicate
 import base64
 import datetime
+import os
+import socket
+import time
+import uuid
 from bson import ObjectId
 
+# Aadhar OCR runs in worker processes, never in the web process
+verification_pool = OCRWorkerPool()
+
+# How many of a user's latest submissions are compared for near-duplicates
+DUPLICATE_LOOKBACK = 20
+# Seconds between lease renewals on the pending records a process owns
+OCR_HEARTBEAT_SECONDS = int(os.getenv('OCR_HEARTBEAT_SECONDS', '30'))
+# A pending record whose lease is older than this lost its process and is
+# taken over by another one
+OCR_LEASE_SECONDS = int(os.getenv('OCR_LEASE_SECONDS', str(OCR_HEARTBEAT_SECONDS * 4)))
+
+# This server process, as recorded on the verification jobs it queued
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def queue_busy_response():
+    return jsonify({
+        "success": False,
+        "message": "Verification queue is busy, please retry shortly"
+    }), 503, {"Retry-After": "10"}
+
+def find_duplicate_verification(user_id, digest, image_phash):
+    """
+    Find an earlier submission by the same user of the same photo: first by
+    exact byte hash, then by perceptual hash among the latest submissions.
+    Submissions whose OCR failed are not reused so the user can retry.
+    """
+    user_object_id = ObjectId(user_id)
+    projection = {"status": 1, "created_at": 1, "image_phash": 1, "error": 1}
+    
+    record = verification_records.find_one(
+        {"user_id": user_object_id, "image_sha256": digest, "error": {"$exists": False}},
+        projection
+    )
+    if record or not image_phash:
+        return record
+    
+    candidates = verification_records.find(
+        {"user_id": user_object_id, "image_phash": {"$exists": True}, "error": {"$exists": False}},
+        projection,
+        sort=[("created_at", -1)],
+        limit=DUPLICATE_LOOKBACK
+    )
+    for candidate in candidates:
+        if is_near_duplicate(image_phash, candidate["image_phash"]):
+            return candidate
+    return None
+
+def submit_verification_job(verification_id, user_id, image_path, is_temp=False):
+    """
+    Queue OCR for a verification record; the record moves from pending to
+    approved or rejected when the worker finishes, or to error when OCR
+    itself failed (worker crash, Tesseract error) so the user is not blamed
+    The job owns image_path and deletes it when done if is_temp is set
+    Raises QueueFullError when the pool is saturated
+    """
+    def on_done(result, error, timing):
+        if is_temp and os.path.exists(image_path):
+            os.remove(image_path)
+        
+        now = datetime.datetime.utcnow()
+        if error:
+            status = "error"
+        else:
+            status = "approved" if result["approved"] else "rejected"
+        update = {"status": status, "processed_at": now, "timing": timing}
+        if error:
+            update["error"] = error
+        verification_records.update_one({"_id": verification_id}, {"$set": update})
+        
+        if status == "approved":
+            customer_records.update_one(
+                {"_id": ObjectId(user_id)},
+                {"$set": {"is_verified": True, "updated_at": now}}
+            )
+            invalidate_user(user_id)
+        print(f"Verification {verification_id}: {status} ({timing['ocr_ms']}ms OCR, {timing['total_ms']}ms total)")
+
+    try:
+        verification_pool.submit(image_path, on_done)
+    except Exception:
+        if is_temp and os.path.exists(image_path):
+            os.remove(image_path)
+        raise
+
+def renew_verification_leases():
+    """
+    Mark the pending records whose jobs this process holds as still owned
+    """
+    verification_records.update_many(
+        {"status": "pending", "worker_id": WORKER_ID},
+        {"$set": {"heartbeat_at": datetime.datetime.utcnow()}}
+    )
+
+def claim_orphaned_verification():
+    """
+    Take the oldest pending record whose owner stopped renewing its lease
+    (the process is gone, and its queued job with it). The claim is atomic,
+    so two processes never take over the same record.
+    """
+    now = datetime.datetime.utcnow()
+    return verification_records.find_one_and_update(
+        {
+            "status": "pending",
+            "$or": [
+                {"heartbeat_at": {"$lt": now - datetime.timedelta(seconds=OCR_LEASE_SECONDS)}},
+                {"heartbeat_at": {"$exists": False}}
+            ]
+        },
+        {"$set": {"worker_id": WORKER_ID, "heartbeat_at": now}},
+        projection={"user_id": 1, "image_sha256": 1},
+        sort=[("created_at", 1)]
+    )
+
+def resume_orphaned_verifications():
+    """
+    Re-queue OCR for orphaned records while the pool has free slots;
+    returns how many were queued
+    """
+    resumed = 0
+    while not verification_pool.is_full():
+        record = claim_orphaned_verification()
+        if not record:
+            break
+        try:
+            image_path, is_temp = materialize_blob(record["image_sha256"])
+            submit_verification_job(record["_id"], str(record["user_id"]), image_path, is_temp)
+            resumed += 1
+        except QueueFullError:
+            # New uploads took the free slots; let the record be claimed again
+            verification_records.update_one({"_id": record["_id"]}, {"$unset": {"heartbeat_at": ""}})
+            break
+        except Exception as e:
+            verification_records.update_one(
+                {"_id": record["_id"]},
+                {"$set": {"status": "error", "error": f"Could not resume: {e}", "processed_at": datetime.datetime.utcnow()}}
+            )
+    return resumed
+
+def verification_heartbeat():
+    """
+    Background loop of every server process: renews the leases on its own
+    pending records and takes over the records of processes that stopped
+    (a restart, a crashed gunicorn worker)
+    """
+    while True:
+        try:
+            database_ready.get()
+            renew_verification_leases()
+            resumed = resume_orphaned_verifications()
+            if resumed:
+                print(f"Resumed {resumed} orphaned verifications")
+        except Exception as e:
+            print(f"Error in verification heartbeat: {e}")
+        time.sleep(OCR_HEARTBEAT_SECONDS)
+
 def verify_user_image():
     """
     Handle user image verification
-    Expected JSON input:
+    Preferred multipart/form-data input (streamed to the blob store):
+        user_id: "user_object_id"
+        image: <file>
+    Legacy JSON input:
     {
         "user_id": "user_object_id",
         "image_data": "base64_encoded_image_data"
     }
     """
     try:
-        # Get JSON data from request
-        data = request.get_json()
+        upload = request.files.get('image')
+        if upload:
+            user_id = request.form.get('user_id')
+        else:
+            # Get JSON data from request
+            data = request.get_json(silent=True) or {}
+            user_id = data.get('user_id')
         
         # Validate input
-        if not data or not data.get('user_id') or not data.get('image_data'):
+        if not user_id or not (upload or data.get('image_data')):
             return jsonify({
                 "success": False,
                 "message": "User ID and image data are required"
             }), 400
         
-        user_id = data['user_id']
-        image_data = data['image_data']
-        
         # Validate user exists
-        user = customer_records.find_one({"_id": ObjectId(user_id)})
+        user = get_user(user_id)
         if not user:
             return jsonify({
                 "success": False,
                 "message": "User not found"
             }), 404
         
-        # Store verification record
-        verification_record = {
-            "user_id": ObjectId(user_id),
-            "image_data": image_data,  # In production, you should encrypt this
-            "created_at": datetime.datetime.utcnow(),
-            "status": "pending"  # pending, approved, rejected
-        }
-        
-        result = verification_records.insert_one(verification_record)
+        # Store the image in the blob store; Mongo only keeps the hash
+        if upload:
+            blob = save_blob(upload.stream, upload.mimetype)
+            content_type = upload.mimetype
+        else:
+            image_data = data['image_data']
+            content_type = "image/jpeg"
+            if image_data.startswith('data:') and ',' in image_data:
+                header, image_data = image_data.split(',', 1)
+                content_type = header[5:].split(';')[0] or content_type
+            blob = save_bytes(base64.b64decode(image_data), content_type)
         
-        if result.inserted_id:
-            # Update user verification status
-            customer_records.update_one(
-                {"_id": ObjectId(user_id)},
-                {"$set": {"is_verified": True, "updated_at": datetime.datetime.utcnow()}}
-            )
+        # The byte hash comes from the blob store; the perceptual hash also
+        # catches retries of the same photo that were re-encoded or resized
+        image_path, is_temp = materialize_blob(blob["sha256"])
+        submitted = False
+        try:
+            try:
+                image_phash = perceptual_hash(image_path)
+            except Exception as e:
+                print(f"Could not compute perceptual hash: {e}")
+                image_phash = None
             
-            return jsonify({
-                "success": True,
-                "message": "Image verification submitted successfully",
-                "verification_id": str(result.inserted_id)
-            }), 200
-        else:
-            return jsonify({
-                "success": False,
-                "message": "Failed to submit verification"
-            }), 500
+            # Reuse an earlier submission and its OCR result instead of new work
+            duplicate = find_duplicate_verification(user_id, blob["sha256"], image_phash)
+            if duplicate:
+                return jsonify({
+                    "success": True,
+                    "message": "Image verification already submitted",
+                    "verification_id": str(duplicate["_id"]),
+                    "verification_status": duplicate.get("status", "pending"),
+                    "duplicate": True
+                }), 200
+            
+            # Refuse instead of queueing without bound
+            if verification_pool.is_full():
+                return queue_busy_response()
+            
+            # Store verification record
+            now = datetime.datetime.utcnow()
+            verification_record = {
+                "user_id": ObjectId(user_id),
+                "image_sha256": blob["sha256"],  # In production, you should encrypt the blob
+                "image_phash": image_phash,
+                "image_size": blob["size"],
+                "image_content_type": content_type,
+                "created_at": now,
+                "status": "pending",  # pending, approved, rejected, error
+                # Owner of the queued job, see verification_heartbeat
+                "worker_id": WORKER_ID,
+                "heartbeat_at": now
+            }
+            if not image_phash:
+                del verification_record["image_phash"]
+            
+            result = verification_records.insert_one(verification_record)
+            
+            if result.inserted_id:
+                try:
+                    submitted = True
+                    submit_verification_job(result.inserted_id, user_id, image_path, is_temp)
+                except QueueFullError:
+                    verification_records.delete_one({"_id": result.inserted_id})
+                    return queue_busy_response()
+                except Exception:
+                    # Never leave a record pending that no job will finish
+                    verification_records.delete_one({"_id": result.inserted_id})
+                    raise
+                
+                return jsonify({
+                    "success": True,
+                    "message": "Image verification submitted successfully",
+                    "verification_id": str(result.inserted_id),
+                    "verification_status": "pending"
+                }), 202
+        finally:
+            if is_temp and not submitted and os.path.exists(image_path):
+                os.remove(image_path)
+        
+        return jsonify({
+            "success": False,
+            "message": "Failed to submit verification"
+        }), 500
             
     except Exception as e:
         return jsonify({
@@ -77,6 +302,7 @@ def get_verification_status(user_id):
         # Find latest verification record for user
         verification_record = verification_records.find_one(
             {"user_id": ObjectId(user_id)},
+            {"status": 1, "created_at": 1},
             sort=[("created_at", -1)]
         )
         
@@ -96,4 +322,69 @@ def get_verification_status(user_id):
         return jsonify({
             "success": False,
             "message": f"Error fetching verification status: {str(e)}"
-        }), 500
\ No newline at end of file
+        }), 500
+
+def authenticated_user_id():
+    """
+    User id from the request's "Authorization: Bearer <token>" header,
+    or None when the token is missing or invalid
+    """
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    payload, valid = verify_token(auth_header[len('Bearer '):].strip())
+    return payload.get('user_id') if valid else None
+
+def can_view_verification(user_id, verification_record):
+    """Only the user who submitted the image, or an admin, may see it"""
+    if str(verification_record["user_id"]) == user_id:
+        return True
+    user = get_user(user_id)
+    return bool(user) and user.get("role") == "admin"
+
+def get_verification_image(verification_id):
+    """
+    Stream the image of a verification record from the blob store.
+    Requires the owner's (or an admin's) login token.
+    """
+    try:
+        user_id = authenticated_user_id()
+        if not user_id:
+            return jsonify({
+                "success": False,
+                "message": "Authentication required"
+            }), 401
+        
+        verification_record = verification_records.find_one(
+            {"_id": ObjectId(verification_id)},
+            {"user_id": 1, "image_sha256": 1, "image_size": 1, "image_content_type": 1}
+        )
+        # Someone else's record looks the same as a missing one
+        if (not verification_record or not verification_record.get("image_sha256")
+                or not can_view_verification(user_id, verification_record)):
+            return jsonify({
+                "success": False,
+                "message": "Verification image not found"
+            }), 404
+        
+        digest = verification_record["image_sha256"]
+        if not blob_exists(digest):
+            return jsonify({
+                "success": False,
+                "message": "Verification image not found"
+            }), 404
+        
+        headers = {"ETag": digest}
+        if verification_record.get("image_size"):
+            headers["Content-Length"] = str(verification_record["image_size"])
+        return Response(
+            stream_with_context(iter_blob(digest)),
+            mimetype=verification_record.get("image_content_type", "application/octet-stream"),
+            headers=headers
+        )
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": f"Error fetching verification image: {str(e)}"
+        }), 500
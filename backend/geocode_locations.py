@@ -5,13 +5,32 @@ Geocoding utility script that converts location names to coordinates using geopy
 
 import json
 import os
+import sys
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 import time
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'codes'))
+from jsonl_store import JsonlStore
+from batch_geocoder import BatchGeocoder, LOOKUP_FAILED
+
 # Initialize geocoder with a user agent
 geolocator = Nominatim(user_agent="safeguard_app")
 
+def lookup_place(place, city="Pune", country="India"):
+    """
+    Geocode one place for the batch geocoder: returns None if it is not
+    found and lets timeouts and service errors propagate so they are retried
+    """
+    location = geolocator.geocode(f"{place}, {city}, {country}", timeout=10)
+    if not location:
+        return None
+    return {
+        "latitude": location.latitude,
+        "longitude": location.longitude,
+        "full_address": location.address
+    }
+
 def geocode_location(location_string, city="Pune", country="India"):
     """
     Convert a location string to coordinates using geopy
@@ -54,18 +73,33 @@ def geocode_location(location_string, city="Pune", country="India"):
         print(f"Unexpected error geocoding {location_string}: {e}")
         return None
 
+def legacy_json_path(path):
+    """
+    The pretty-printed JSON file a .jsonl store replaces (crime_locations.jsonl -> crime_locations.json)
+    """
+    return path[:-1] if path.endswith('.jsonl') else None
+
+def load_locations(input_file):
+    """
+    Read location records from a JSONL store or a legacy JSON list
+    """
+    if input_file.endswith('.jsonl'):
+        return list(JsonlStore(input_file, legacy_json_path=legacy_json_path(input_file), read_only=True).records())
+    with open(input_file, 'r') as f:
+        return json.load(f)
+
 def process_crime_locations(input_file, output_file):
     """
     Process a list of crime locations and convert them to coordinates
     
     Args:
-        input_file (str): Path to input JSON file with location names
-        output_file (str): Path to output JSON file with geocoded locations
+        input_file (str): Path to input JSONL (or legacy JSON) file with location names
+        output_file (str): Path to output JSONL file with geocoded locations;
+            results are appended and locations already in it are skipped
     """
     # Read input locations
-    if os.path.exists(input_file):
-        with open(input_file, 'r') as f:
-            locations = json.load(f)
+    if os.path.exists(input_file) or os.path.exists(legacy_json_path(input_file) or input_file):
+        locations = load_locations(input_file)
     else:
         # Default locations if input file doesn't exist
         locations = [
@@ -76,28 +110,32 @@ def process_crime_locations(input_file, output_file):
             {"location_string": "Warje"}
         ]
     
+    output_store = JsonlStore(output_file, legacy_json_path=legacy_json_path(output_file))
     print(f"Processing {len(locations)} locations...")
     
-    # Geocode each location
-    geocoded_locations = []
-    for loc in locations:
-        location_string = loc.get("location_string")
-        if location_string:
-            result = geocode_location(location_string)
-            if result:
-                geocoded_locations.append(result)
-                print(f"Successfully geocoded: {location_string}")
-            else:
-                print(f"Failed to geocode: {location_string}")
-            
-            # Add a small delay to respect rate limits
-            time.sleep(1)
+    # Geocode each location not geocoded before in one rate-limited batch;
+    # lookups are cached as they return, so an interrupted run resumes
+    pending = [
+        loc.get("location_string") for loc in locations
+        if loc.get("location_string") and loc.get("location_string") not in output_store
+    ]
+    geocoder = BatchGeocoder(lookup_place)
+    results = geocoder.geocode_many(pending)
     
-    # Save results
-    with open(output_file, 'w') as f:
-        json.dump(geocoded_locations, f, indent=2)
+    geocoded_locations = []
+    for location_string, result in results.items():
+        if result is LOOKUP_FAILED:
+            print(f"Geocoding failed for {location_string}, will retry on the next run")
+        elif result:
+            geocoded_locations.append(dict(result, location_string=location_string, timestamp=time.time()))
+            print(f"Successfully geocoded: {location_string}")
+        else:
+            print(f"Failed to geocode: {location_string}")
+    output_store.append(geocoded_locations)
     
-    print(f"Geocoded {len(geocoded_locations)} locations. Results saved to {output_file}")
+    output_store.maybe_compact()
+    print(f"Geocoder stats: {geocoder.stats}")
+    print(f"Geocoded {len(geocoded_locations)} new locations. Results saved to {output_file}")
     return geocoded_locations
 
 def create_sample_crime_data():
@@ -127,11 +165,11 @@ def create_sample_crime_data():
 
 if __name__ == "__main__":
     # Create sample data if needed
-    input_file = os.path.join(os.path.dirname(__file__), 'codes', 'crime_locations.json')
-    output_file = os.path.join(os.path.dirname(__file__), 'codes', 'crime_locations_geocoded.json')
+    input_file = os.path.join(os.path.dirname(__file__), 'codes', 'crime_locations.jsonl')
+    output_file = os.path.join(os.path.dirname(__file__), 'codes', 'crime_locations_geocoded.jsonl')
     
     # If input file doesn't exist, create sample data
-    if not os.path.exists(input_file):
+    if not os.path.exists(input_file) and not os.path.exists(legacy_json_path(input_file)):
         print("Creating sample crime location data...")
         create_sample_crime_data()
     